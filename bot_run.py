@@ -7,10 +7,17 @@ import logging
 import os
 import asyncio
 from dotenv import load_dotenv
-from database.session import async_main
+from database.session import async_main, engine, replica_engines, replica_health_loop
+from database.stats import reconcile_loop
+from logging_setup import setup_logging, LogContextMiddleware
+import query_budget
+from traffic_ingest import start_ingest
 
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
+log_listener = setup_logging(logging.INFO)
+# Каждый SQL-запрос с параметрами — самый объемный источник логов, поэтому только по запросу
+if os.getenv("LOG_SQL"):
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
 
 bot = Bot(
     token=os.getenv("BOT_TOKEN"),
@@ -21,7 +28,24 @@ bot = Bot(
 
 dp = Dispatcher(storage=MemoryStorage())
 
+# Ссылки на фоновые задачи: event loop держит их только слабыми ссылками
+background_tasks = set()
+
+def _on_task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logging.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+def track_task(task: asyncio.Task) -> asyncio.Task:
+    background_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
 async def main():
+    dp.update.outer_middleware(LogContextMiddleware())
+    if query_budget.MODE:
+        query_budget.install([engine, *replica_engines])
+        dp.update.outer_middleware(query_budget.QueryBudgetMiddleware(strict=query_budget.MODE == "strict"))
     dp.include_router(start.router)
     dp.include_router(profile.router)
     dp.include_router(subscription.router)
@@ -31,8 +55,16 @@ async def main():
     dp.include_router(admin.router)
 
     await async_main()
+    track_task(asyncio.create_task(reconcile_loop(), name="reconcile_stats"))
+    if replica_engines:
+        track_task(asyncio.create_task(replica_health_loop(), name="replica_health"))
+    for task in start_ingest():
+        track_task(task)
     logging.info("Бот успешно загружен")
     await dp.start_polling(bot)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
\ No newline at end of file
@@ -1,67 +1,180 @@
-from database.models import User
-from database.session import async_session
-from sqlalchemy import select
+import asyncio
+from database.models import User, TrafficDaily
+from database.session import async_session, read_session, mark_written, mark_unhealthy, dialect_insert
+from database.stats import bump_totals, bump_daily
+from sqlalchemy import select, update, case, or_, func
+from sqlalchemy.exc import DBAPIError
 from datetime import datetime, timedelta
+from collections import Counter, OrderedDict
 
-async def create_user(tg_id: int, username: str = None, full_name: str = None, ref_code: int = None):
+REFERRAL_BONUS_DAYS = 7
+BULK_CHUNK_SIZE = 1000
+LANGUAGE_CACHE_SIZE = 100_000
+# Чтение с реплики дольше этого (сек) считается ее сбоем и повторяется на primary,
+# иначе реплика, которая не отвечает на пакеты, держала бы запросы до TCP-таймаута
+REPLICA_READ_TIMEOUT = 2
+
+_languages = OrderedDict()  # tg_id -> User.language
+
+def _remember_language(tg_id: int, language: str):
+    _languages[tg_id] = language
+    _languages.move_to_end(tg_id)
+    if len(_languages) > LANGUAGE_CACHE_SIZE:
+        _languages.popitem(last=False)
+
+def _remember_user(user):
+    if user is not None:
+        _remember_language(user.tg_id, user.language)
+    return user
+
+def _add_days(session, column, days: int):
+    """SQL-выражение column + days дней для текущего диалекта"""
+    if session.bind.dialect.name == "sqlite":
+        # SQLAlchemy хранит DateTime в SQLite как 'YYYY-MM-DD HH:MM:SS.ffffff'; datetime() отбросил бы
+        # микросекунды, поэтому дробная часть (с 20-го символа) переносится из исходного значения
+        shifted = func.strftime("%Y-%m-%d %H:%M:%S", column, f"+{days} days")
+        return shifted.op("||")(func.substr(column, 20))
+    return column + timedelta(days=days)
+
+async def _credit_referrer(session, referrer_tg_id: int, invited: int, now: datetime) -> bool:
+    """Атомарно начисляет рефереру приглашения и бонусные дни премиума; False, если реферера нет"""
+    days = REFERRAL_BONUS_DAYS * invited
+    expired = or_(User.premium_until.is_(None), User.premium_until < now)
+    result = await session.execute(
+        update(User)
+        .where(User.tg_id == referrer_tg_id)
+        .values(
+            referrals_count=User.referrals_count + invited,
+            is_premium=True,
+            premium_until=case((expired, now + timedelta(days=days)),
+                               else_=_add_days(session, User.premium_until, days))
+        )
+        .returning(User.language)
+        .execution_options(synchronize_session=False)
+    )
+    language = result.scalar_one_or_none()
+    if language is None:
+        return False
+    _remember_language(referrer_tg_id, language)
+    return True
+
+def _referrer_id(ref_code: int):
+    """user.id реферера по его tg_id прямо в INSERT; неизвестный реферер дает NULL"""
+    return select(User.id).where(User.tg_id == ref_code).scalar_subquery()
+
+async def create_user(tg_id: int, username: str = None, full_name: str = None, ref_code: int = None,
+                      language: str = None):
+    """Регистрирует пользователя одной транзакцией: INSERT ... ON CONFLICT DO NOTHING RETURNING
+    и атомарное начисление бонуса рефереру. Повторная регистрация возвращает существующего пользователя.
+
+    ref_code — tg_id реферера. Возвращает (user, начислен ли бонус рефереру).
+    """
+    ref_code = ref_code if ref_code and ref_code != tg_id else None
+    values = dict(tg_id=tg_id, username=username, full_name=full_name)
+    if ref_code:
+        values["referrer_id"] = _referrer_id(ref_code)
+    if language:
+        values["language"] = language
     async with async_session() as session:
-        result = await session.execute(select(User).where(User.tg_id == tg_id))
-        user = result.scalar_one_or_none()
-        if user:
-            return user
-
-        user = User(
-            tg_id=tg_id,
-            username=username,
-            full_name=full_name,
-            referrer_id=ref_code if ref_code != tg_id else None
+        stmt = (
+            dialect_insert(session, User)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[User.tg_id])
+            .returning(User)
         )
-        session.add(user)
-
-        if ref_code and ref_code != tg_id:
-            result = await session.execute(select(User).where(User.tg_id == ref_code))
-            referrer = result.scalar_one_or_none()
-            if referrer:
-                referrer.referrals_count += 1
-                referrer.is_premium = True
-                if not referrer.premium_until:
-                    referrer.premium_until = datetime.utcnow() + timedelta(days=7)
-                else:
-                    referrer.premium_until += timedelta(days=7)
-                try:
-                    await session.flush()
-                except:
-                    pass
+        user = (await session.execute(stmt)).scalar_one_or_none()
+        if user is None:
+            # Пользователь уже есть (или параллельная капча успела раньше)
+            result = await session.execute(select(User).where(User.tg_id == tg_id))
+            return _remember_user(result.scalar_one_or_none()), False
+
+        referred = user.referrer_id is not None
+        referrer_credited = False
+        if referred:
+            referrer_credited = await _credit_referrer(session, ref_code, 1, datetime.utcnow())
 
+        # День берется из created_at, как в reconcile_stats, иначе регистрации около полуночи расходились бы
+        await bump_daily(session, day=user.created_at.date(), registrations=1, referred_registrations=int(referred))
+        await bump_totals(session, total_users=1, referred_users=int(referred))
         await session.commit()
-        await session.refresh(user)
-        return user
+        mark_written(tg_id, ref_code if referred else None)
+        return _remember_user(user), referrer_credited
+
+async def create_users_bulk(users: list[dict], referral_bonus: bool = True) -> int:
+    """Массовая регистрация для импорта и бэкфилла.
+
+    users — словари с ключами tg_id, username, full_name, ref_code (tg_id реферера). Вставка идет
+    пачками по BULK_CHUNK_SIZE строк с ON CONFLICT DO NOTHING в одной транзакции и
+    одном соединении; бонусы начисляются одним UPDATE на реферера.
+    Возвращает число новых пользователей.
+    """
+    now = datetime.utcnow()
+    rows, ref_codes = {}, {}
+    for item in users:
+        tg_id = item["tg_id"]
+        ref_code = item.get("ref_code")
+        ref_codes[tg_id] = ref_code if ref_code and ref_code != tg_id else None
+        rows[tg_id] = {
+            "tg_id": tg_id,
+            "username": item.get("username"),
+            "full_name": item.get("full_name"),
+            "created_at": now,
+            "referrer_id": _referrer_id(ref_codes[tg_id]) if ref_codes[tg_id] else None,
+        }
+    rows = list(rows.values())
+    if not rows:
+        return 0
 
-async def extend_premium(user_id: int, days: int):
     async with async_session() as session:
-        result = await session.execute(select(User).where(User.tg_id == user_id))
-        user = result.scalar_one_or_none()
-        if not user:
-            return False
+        inserted = []
+        for i in range(0, len(rows), BULK_CHUNK_SIZE):
+            stmt = (
+                dialect_insert(session, User)
+                .values(rows[i:i + BULK_CHUNK_SIZE])
+                .on_conflict_do_nothing(index_elements=[User.tg_id])
+                .returning(User.tg_id, User.referrer_id)
+            )
+            inserted.extend((await session.execute(stmt)).all())
 
-        now = datetime.utcnow()
-        if not user.premium_until or user.premium_until < now:
-            user.premium_until = now + timedelta(days=days)
-        else:
-            user.premium_until += timedelta(days=days)
+        # Реферер, которого нет в БД на момент вставки пачки, не засчитывается
+        invited = Counter(ref_codes[tg_id] for tg_id, referrer_id in inserted if referrer_id is not None)
+        if referral_bonus:
+            for ref_code, count in invited.items():
+                await _credit_referrer(session, ref_code, count, now)
 
-        user.is_premium = True
+        referred = sum(invited.values())
+        await bump_daily(session, day=now.date(), registrations=len(inserted), referred_registrations=referred)
+        await bump_totals(session, total_users=len(inserted), referred_users=referred)
         await session.commit()
-        return True
 
-async def add_balance(user_id: int, amount: float):
+    mark_written(*(tg_id for tg_id, _ in inserted), *invited)
+    for tg_id, _ in inserted:
+        _languages.pop(tg_id, None)  # закэшированный промах больше не верен
+    return len(inserted)
+
+def _extend_premium(user: User, days: int, now: datetime):
+    user.is_premium = True
+    if not user.premium_until or user.premium_until < now:
+        user.premium_until = now + timedelta(days=days)
+    else:
+        user.premium_until += timedelta(days=days)
+
+async def credit_payment(user_id: int, amount: float, days: int):
+    """Зачисление оплаты одной транзакцией: пополнение баланса и, если days > 0, продление премиума"""
     async with async_session() as session:
         result = await session.execute(select(User).where(User.tg_id == user_id))
         user = result.scalar_one_or_none()
         if not user:
             return False
+        _remember_user(user)
+
         user.balance += amount
+        if days > 0:
+            _extend_premium(user, days, datetime.utcnow())
+        await bump_daily(session, revenue=amount, premium_purchases=1 if days > 0 else 0)
+        await bump_totals(session, revenue=amount)
         await session.commit()
+        mark_written(user_id)
         return True
 
 async def spend_balance(user_id: int, amount: float):
@@ -72,17 +185,62 @@ async def spend_balance(user_id: int, amount: float):
             return False
         user.balance -= amount
         await session.commit()
+        mark_written(user_id)
         return True
 
+async def _execute(session_maker, stmt):
+    async with session_maker() as session:
+        return await session.execute(stmt)
+
+async def _read(stmt, user_id: int = None):
+    """Read-only запрос на реплике; при ошибке или таймауте реплики повторяется на primary"""
+    session_maker = read_session(user_id)
+    if session_maker is async_session:
+        return await _execute(async_session, stmt)
+    try:
+        return await asyncio.wait_for(_execute(session_maker, stmt), REPLICA_READ_TIMEOUT)
+    except (DBAPIError, OSError, asyncio.TimeoutError):
+        # asyncpg отдает отказ в соединении как OSError, а не DBAPIError
+        mark_unhealthy(session_maker)
+    return await _execute(async_session, stmt)
+
+async def _read_one(stmt, user_id: int = None):
+    return (await _read(stmt, user_id)).scalar_one_or_none()
+
 async def get_user_by_username(username: str):
     if username.startswith("@"):
         username = username[1:]
-    async with async_session() as session:
-        result = await session.execute(select(User).where(User.username == username))
-        return result.scalar_one_or_none()
+    return _remember_user(await _read_one(select(User).where(User.username == username)))
 
 async def get_user_by_tg(tg_id: int):
-    async with async_session() as session:
-        result = await session.execute(select(User).where(User.tg_id == tg_id))
-        return result.scalar_one_or_none()
+    user = await _read_one(select(User).where(User.tg_id == tg_id), tg_id)
+    if user is None:
+        # Промах тоже запоминается: user_language не пойдет за языком повторно
+        _remember_language(tg_id, None)
+    return _remember_user(user)
+
+async def user_language(tg_id: int, fallback: str = None) -> str | None:
+    """User.language: из кэша, при первом обращении — одним чтением из БД.
+    Для незарегистрированного пользователя запоминается fallback (с ним он и зарегистрируется)."""
+    if tg_id in _languages:
+        _languages.move_to_end(tg_id)
+        language = _languages[tg_id]
+        if language is not None:
+            return language
+        language = fallback  # промах get_user_by_tg
+    else:
+        language = await _read_one(select(User.language).where(User.tg_id == tg_id), tg_id) or fallback
+    if language is not None:
+        _remember_language(tg_id, language)
+    return language
 
+async def get_traffic_usage(tg_id: int):
+    """Трафик за сегодня и за текущий месяц (байты) одним чтением по ключу traffic_daily"""
+    today = datetime.utcnow().date()
+    total = TrafficDaily.rx + TrafficDaily.tx
+    stmt = select(
+        func.coalesce(func.sum(case((TrafficDaily.day == today, total), else_=0)), 0),
+        func.coalesce(func.sum(total), 0)
+    ).where(TrafficDaily.tg_id == tg_id, TrafficDaily.day >= today.replace(day=1))
+    today_bytes, month_bytes = (await _read(stmt, tg_id)).one()
+    return int(today_bytes), int(month_bytes)
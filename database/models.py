@@ -1,7 +1,7 @@
 from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped
-from sqlalchemy import BigInteger, Boolean, DateTime, Integer, ForeignKey, String, Float
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Integer, ForeignKey, String, Float
 from sqlalchemy.ext.asyncio import AsyncAttrs
-from datetime import datetime
+from datetime import date, datetime
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
@@ -17,9 +17,49 @@ class User(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     is_premium: Mapped[bool] = mapped_column(Boolean, default=False)
-    premium_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Индекс нужен счетчику активного премиума в get_dashboard
+    premium_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
 
     balance: Mapped[float] = mapped_column(Float, default=0.0)
 
     referrer_id: Mapped[int | None] = mapped_column(ForeignKey("user.id"), nullable=True)
-    referrals_count: Mapped[int] = mapped_column(Integer, default=0)
\ No newline at end of file
+    referrals_count: Mapped[int] = mapped_column(Integer, default=0)
+
+class StatTotals(Base):
+    """Накопительные счетчики, разложенные по STAT_SHARDS строкам (см. database.stats)"""
+    __tablename__ = "stat_totals"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    total_users: Mapped[int] = mapped_column(BigInteger, default=0)
+    referred_users: Mapped[int] = mapped_column(BigInteger, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0.0)
+    checked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+class DailyStat(Base):
+    """Суточные агрегаты (UTC), по STAT_SHARDS строк на день"""
+    __tablename__ = "daily_stat"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    registrations: Mapped[int] = mapped_column(Integer, default=0)
+    referred_registrations: Mapped[int] = mapped_column(Integer, default=0)
+    premium_purchases: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0.0)
+
+class TrafficUsage(Base):
+    """Трафик пользователя по часовым корзинам (UTC), байты"""
+    __tablename__ = "traffic_usage"
+
+    tg_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    rx: Mapped[int] = mapped_column(BigInteger, default=0)
+    tx: Mapped[int] = mapped_column(BigInteger, default=0)
+
+class TrafficDaily(Base):
+    """Суточный rollup traffic_usage; профиль читает только его"""
+    __tablename__ = "traffic_daily"
+
+    tg_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    rx: Mapped[int] = mapped_column(BigInteger, default=0)
+    tx: Mapped[int] = mapped_column(BigInteger, default=0)
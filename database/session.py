@@ -1,14 +1,117 @@
 import os
+import time
+import asyncio
+import logging
+import itertools
 from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-engine = create_async_engine(url=os.getenv("DB_URL"), echo=True)
+# Реплики для чтения: DB_REPLICA_URLS=url1,url2
+REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+# Сколько секунд после записи читать данные пользователя с primary
+STICKY_SECONDS = float(os.getenv("DB_STICKY_SECONDS", 5))
+HEALTH_CHECK_INTERVAL = 10
+HEALTH_CHECK_TIMEOUT = 3
+
+engine = create_async_engine(url=os.getenv("DB_URL"))
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
+replica_engines = [create_async_engine(url=url) for url in REPLICA_URLS]
+replica_sessions = [async_sessionmaker(e, expire_on_commit=False) for e in replica_engines]
+_healthy = set(range(len(replica_engines)))
+_recent_writes = {}  # tg_id -> monotonic-время, до которого чтения идут на primary
+_round_robin = itertools.count()
+
+def mark_written(*user_ids):
+    """Запоминает запись, чтобы следующие чтения пользователя видели ее (read-your-writes)"""
+    if not replica_sessions:
+        return
+    until = time.monotonic() + STICKY_SECONDS
+    for user_id in user_ids:
+        if user_id is not None:
+            _recent_writes[user_id] = until
+
+def read_session(user_id: int = None):
+    """sessionmaker для read-only запросов: здоровая реплика или primary"""
+    if user_id is not None:
+        until = _recent_writes.get(user_id)
+        if until is not None:
+            if until > time.monotonic():
+                return async_session
+            _recent_writes.pop(user_id, None)
+    healthy = [i for i in range(len(replica_sessions)) if i in _healthy]
+    if not healthy:
+        return async_session
+    return replica_sessions[healthy[next(_round_robin) % len(healthy)]]
+
+def mark_unhealthy(session_maker):
+    """Исключает реплику из ротации до следующей успешной проверки"""
+    if session_maker in replica_sessions:
+        index = replica_sessions.index(session_maker)
+        if index in _healthy:
+            logger.warning("Replica %s marked unhealthy", index)
+        _healthy.discard(index)
+
+async def _ping(replica):
+    async with replica.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def check_replicas():
+    for index, replica in enumerate(replica_engines):
+        try:
+            # Таймаут на подключение тоже: зависшая реплика не должна стопорить проверку остальных
+            await asyncio.wait_for(_ping(replica), HEALTH_CHECK_TIMEOUT)
+        except Exception as e:
+            if index in _healthy:
+                logger.warning("Replica %s failed health check: %s", index, e)
+            _healthy.discard(index)
+        else:
+            if index not in _healthy:
+                logger.info("Replica %s is healthy again", index)
+            _healthy.add(index)
+
+    now = time.monotonic()
+    for user_id in [uid for uid, until in _recent_writes.items() if until <= now]:
+        _recent_writes.pop(user_id, None)
+
+async def replica_health_loop(interval: int = HEALTH_CHECK_INTERVAL):
+    """Периодическая проверка реплик"""
+    while True:
+        await check_replicas()
+        await asyncio.sleep(interval)
+
+def pool_stats() -> dict:
+    """Состояние пулов соединений primary и реплик"""
+    engines = {"primary": engine}
+    engines.update({f"replica{i}": e for i, e in enumerate(replica_engines)})
+    stats = {}
+    for name, e in engines.items():
+        pool = e.pool
+        item = {"pool": type(pool).__name__, "status": pool.status()}
+        if isinstance(pool, QueuePool):
+            item.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        if name != "primary":
+            item["healthy"] = int(name[len("replica"):]) in _healthy
+        stats[name] = item
+    return stats
+
+def dialect_insert(session, table):
+    """INSERT с поддержкой ON CONFLICT для текущего диалекта (postgresql/sqlite)"""
+    if session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
+
 async def async_main():
     """Создает все таблицы"""
     from database.models import Base
+    from database.stats import init_stats
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await init_stats()
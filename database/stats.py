@@ -0,0 +1,150 @@
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func, literal_column, true, union_all
+from database.models import User, StatTotals, DailyStat
+from database.session import async_session, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Каждый счетчик разложен по STAT_SHARDS строкам: запись увеличивает случайную,
+# чтение суммирует все. Иначе все регистрации и платежи до коммита ждали бы
+# блокировку одной строки.
+STAT_SHARDS = 16
+SHARD_IDS = range(1, STAT_SHARDS + 1)
+TOTALS_FIELDS = ("total_users", "referred_users", "revenue")
+DAILY_FIELDS = ("registrations", "referred_registrations", "premium_purchases", "revenue")
+RECONCILE_INTERVAL = 60 * 60
+RECONCILE_DAYS = 7
+
+async def bump_totals(session, **deltas):
+    """Атомарно увеличивает накопительные счетчики в текущей транзакции.
+
+    Держит блокировку строки до коммита, поэтому вызывается последним запросом перед commit().
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    values = {name: getattr(StatTotals, name) + delta for name, delta in deltas.items()}
+    shard = random.choice(SHARD_IDS)
+    await session.execute(update(StatTotals).where(StatTotals.id == shard).values(**values))
+
+async def bump_daily(session, day=None, **deltas):
+    """Увеличивает суточный агрегат, создавая строку дня при первом обращении.
+
+    Вызывается перед bump_totals, в конце транзакции.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    day = day or datetime.utcnow().date()
+    stmt = dialect_insert(session, DailyStat).values(day=day, shard=random.choice(SHARD_IDS), **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStat.day, DailyStat.shard],
+        set_={name: getattr(DailyStat, name) + getattr(stmt.excluded, name) for name in deltas}
+    )
+    await session.execute(stmt)
+
+async def init_stats():
+    """Создает строки счетчиков и сверяет их с таблицей пользователей"""
+    async with async_session() as session:
+        stmt = dialect_insert(session, StatTotals).values([{"id": shard} for shard in SHARD_IDS])
+        await session.execute(stmt.on_conflict_do_nothing())
+        await session.commit()
+    await reconcile_stats()
+
+async def get_dashboard():
+    """Счетчики, число активных премиумов и агрегаты за сегодня/вчера — два чтения.
+
+    Активный премиум не хранится счетчиком (истечение не пишет в БД), а считается
+    по индексу premium_until: это диапазон только по действующим подпискам.
+    """
+    now = datetime.utcnow()
+    today = now.date()
+    yesterday = today - timedelta(days=1)
+    active_premium = select(func.count(User.id)).where(User.premium_until > now).scalar_subquery()
+    async with async_session() as session:
+        row = (await session.execute(
+            select(*(func.sum(getattr(StatTotals, name)) for name in TOTALS_FIELDS), func.max(StatTotals.checked_at),
+                   active_premium)
+            .where(StatTotals.id.between(SHARD_IDS[0], SHARD_IDS[-1]))
+        )).one()
+        rows = await session.execute(
+            select(DailyStat.day, *(func.sum(getattr(DailyStat, name)) for name in DAILY_FIELDS))
+            .where(DailyStat.day.in_([today, yesterday]))
+            .group_by(DailyStat.day)
+        )
+        daily = {day: DailyStat(day=day, **dict(zip(DAILY_FIELDS, values))) for day, *values in rows}
+
+    totals = None
+    *sums, checked_at, active = row
+    if sums[0] is not None:
+        totals = StatTotals(**dict(zip(TOTALS_FIELDS, sums)), checked_at=checked_at)
+    return totals, active, daily.get(today), daily.get(yesterday)
+
+def _drift(title, seen, actual) -> dict:
+    """Поправки actual - seen по полям; каждое расхождение пишется в лог"""
+    deltas = {}
+    for name, value in actual.items():
+        current = seen.get(name) or 0
+        if current != value:
+            logger.warning("Stats drift in %s %s: %s -> %s", title, name, current, value)
+            deltas[name] = value - current
+    return deltas
+
+async def reconcile_stats():
+    """Пересчитывает счетчики по таблице user и исправляет расхождения, не блокируя записи.
+
+    Сумма шардов и фактическое число читаются одним запросом, то есть из одного снимка,
+    а разница применяется инкрементом x = x + (actual - seen) через bump_*: регистрации,
+    закоммиченные после снимка, не попали ни в одну из сумм и не теряются. Выручку
+    восстановить не из чего (платежи не хранятся), поэтому она не сверяется.
+    """
+    now = datetime.utcnow()
+    days = [now.date() - timedelta(days=i) for i in range(RECONCILE_DAYS)]
+    since_dt = datetime.combine(days[-1], datetime.min.time())
+
+    seen = select(*(func.sum(getattr(StatTotals, name)).label(name) for name in ("total_users", "referred_users"))) \
+        .where(StatTotals.id.in_(SHARD_IDS)).subquery()
+    actual = select(func.count(User.id).label("total_users"), func.count(User.referrer_id).label("referred_users")) \
+        .subquery()
+    day_col = func.date(User.created_at)
+    per_day = union_all(
+        select(literal_column("0"), DailyStat.day, func.sum(DailyStat.registrations),
+               func.sum(DailyStat.referred_registrations))
+        .where(DailyStat.day.in_(days)).group_by(DailyStat.day),
+        select(literal_column("1"), day_col, func.count(User.id), func.count(User.referrer_id))
+        .where(User.created_at >= since_dt).group_by(day_col),
+    )
+
+    # 0 — суммы шардов daily_stat, 1 — фактические регистрации по created_at
+    counted = ({}, {day: {"registrations": 0, "referred_registrations": 0} for day in days})
+    async with async_session() as session:
+        row = (await session.execute(select(seen, actual).select_from(seen.join(actual, true())))).one()
+        for source, day, registrations, referred in await session.execute(per_day):
+            if isinstance(day, str):
+                day = datetime.strptime(day, "%Y-%m-%d").date()
+            if day in counted[1]:
+                counted[source][day] = {"registrations": registrations, "referred_registrations": referred}
+
+    totals = _drift("totals", {"total_users": row[0], "referred_users": row[1]},
+                    {"total_users": row[2], "referred_users": row[3]})
+    daily = {day: _drift(day, counted[0].get(day, {}), values) for day, values in counted[1].items()}
+
+    async with async_session() as session:
+        # Порядок как у записей: сначала daily, последним totals
+        for day, deltas in daily.items():
+            await bump_daily(session, day=day, **deltas)
+        await session.execute(update(StatTotals).where(StatTotals.id == SHARD_IDS[0]).values(checked_at=now))
+        await bump_totals(session, **totals)
+        await session.commit()
+
+async def reconcile_loop(interval: int = RECONCILE_INTERVAL):
+    """Периодическая сверка счетчиков с источником истины"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile_stats()
+        except Exception:
+            logger.exception("Stats reconciliation failed")
@@ -3,7 +3,12 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from database.crud import get_user_by_username
-from keyboards.main import back_button
+from database.stats import get_dashboard
+from database.session import pool_stats
+from keyboards.main import BACK_KEYBOARDS
+from locales import t, language_of
+from logging_setup import dropped_records
+from message_render import render
 
 router = Router()
 ADMINS = ["enjoyoneday", "whatyousayah"]
@@ -13,18 +18,63 @@ class AdminCheck(StatesGroup):
 
 @router.callback_query(F.text == "check_ref")
 async def admin_check_ref(callback: CallbackQuery, state: FSMContext):
+    lang = await language_of(callback.from_user)
     if callback.from_user.username not in ADMINS:
-        await callback.answer("❌ Только админ может использовать эту кнопку.", show_alert=True)
+        await callback.answer(t(lang, "admin_only"), show_alert=True)
         return
-    await callback.message.edit_text("Введите @username пользователя для проверки рефералов:")
+    await render(callback, t(lang, "admin_enter_username"))
     await state.set_state(AdminCheck.waiting_for_username)
 
 @router.message(AdminCheck.waiting_for_username)
 async def admin_receive_username(message: Message, state: FSMContext):
     username = message.text.lstrip("@")
     user = await get_user_by_username(username)
+    lang = await language_of(message.from_user)
     if not user:
-        await message.answer("❌ Пользователь не найден.")
+        await message.answer(t(lang, "user_not_found"))
     else:
-        await message.answer(f"👥 Пользователь @{username} пригласил {user.referrals_count} пользователей.", reply_markup=back_button)
+        await message.answer(t(lang, "admin_user_referrals", username=username, count=user.referrals_count),
+                             reply_markup=BACK_KEYBOARDS[lang])
     await state.clear()
+
+@router.callback_query(F.data == "admin_stats")
+async def admin_stats(callback: CallbackQuery):
+    lang = await language_of(callback.from_user)
+    if callback.from_user.username not in ADMINS:
+        await callback.answer(t(lang, "admin_only"), show_alert=True)
+        return
+
+    totals, active_premium, today, yesterday = await get_dashboard()
+    if not totals:
+        await callback.answer(t(lang, "admin_stats_not_ready"), show_alert=True)
+        return
+
+    conversion = totals.referred_users / totals.total_users * 100 if totals.total_users else 0
+    checked = totals.checked_at.strftime("%d.%m.%Y %H:%M") if totals.checked_at else "-"
+
+    def day_line(title, stat):
+        if not stat:
+            return t(lang, "admin_day", title=title, registrations=0, referred=0, purchases=0, revenue=0)
+        return t(lang, "admin_day", title=title, registrations=stat.registrations,
+                 referred=stat.referred_registrations, purchases=stat.premium_purchases, revenue=stat.revenue)
+
+    pools = "\n".join(
+        t(lang, "admin_pool", name=name, checked_out=item.get("checked_out", "-"), size=item.get("size", "-"))
+        + ("" if item.get("healthy", True) else t(lang, "admin_pool_down"))
+        for name, item in pool_stats().items()
+    )
+
+    text = t(
+        lang, "admin_stats",
+        total_users=totals.total_users,
+        active_premium=active_premium,
+        revenue=totals.revenue,
+        referred_users=totals.referred_users,
+        conversion=conversion,
+        today=day_line(t(lang, "admin_today"), today),
+        yesterday=day_line(t(lang, "admin_yesterday"), yesterday),
+        checked=checked,
+        pools=pools,
+        dropped=dropped_records()
+    )
+    await render(callback, text, reply_markup=BACK_KEYBOARDS[lang])
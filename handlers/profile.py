@@ -1,31 +1,35 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
-from database.crud import get_user_by_tg
-from keyboards.main import back_button
+from database.crud import get_user_by_tg, get_traffic_usage
+from keyboards.main import BACK_KEYBOARDS
+from locales import t, language_of, format_bytes
+from message_render import render
 
 router = Router()
 
 @router.callback_query(F.data == "profile")
 async def profile_handler(callback: CallbackQuery):
     user = await get_user_by_tg(callback.from_user.id)
+    lang = await language_of(callback.from_user)
     if not user:
-        await callback.message.edit_text("❌ Пользователь не найден.", reply_markup=back_button)
+        await render(callback, t(lang, "user_not_found"), reply_markup=BACK_KEYBOARDS[lang])
         return
 
-    premium_text = f"Активна до: {user.premium_until.strftime('%d.%m.%Y %H:%M')}" if user.premium_until else "Нет"
+    today_bytes, month_bytes = await get_traffic_usage(user.tg_id)
+    traffic_text = t(lang, "profile_traffic", today=format_bytes(lang, today_bytes), month=format_bytes(lang, month_bytes))
 
-    profile_text = f"""
-👤 Профиль пользователя
+    premium_text = t(lang, "premium_active_until", date=user.premium_until.strftime('%d.%m.%Y %H:%M')) if user.premium_until else t(lang, "premium_none")
 
-ID Telegram: {user.tg_id}
-Username: @{user.username if user.username else '-'}
-Имя: {user.full_name if user.full_name else '-'}
-Премиум: {"✅ Да" if user.is_premium else "❌ Нет"}
-Баланс: {user.balance}
-{premium_text}
-
-Дата регистрации: {user.created_at.strftime("%d.%m.%Y %H:%M")}
-
-🔗 Приглашено пользователей: {user.referrals_count}
-"""
-    await callback.message.edit_text(profile_text, reply_markup=back_button)
+    profile_text = t(
+        lang, "profile",
+        tg_id=user.tg_id,
+        username=user.username if user.username else '-',
+        full_name=user.full_name if user.full_name else '-',
+        premium=t(lang, "premium_yes") if user.is_premium else t(lang, "premium_no"),
+        balance=user.balance,
+        premium_until=premium_text,
+        traffic=traffic_text,
+        created_at=user.created_at.strftime("%d.%m.%Y %H:%M"),
+        referrals_count=user.referrals_count
+    )
+    await render(callback, profile_text, reply_markup=BACK_KEYBOARDS[lang])
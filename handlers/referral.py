@@ -3,7 +3,9 @@ from aiogram.types import CallbackQuery
 from database.crud import get_user_by_tg, get_user_by_username
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from keyboards.main import back_button
+from keyboards.main import BACK_KEYBOARDS
+from locales import t, language_of
+from message_render import render
 
 router = Router()
 
@@ -15,38 +17,37 @@ class AdminCheck(StatesGroup):
 @router.callback_query(F.data == "referral")
 async def referral_handler(callback: CallbackQuery):
     user = await get_user_by_tg(callback.from_user.id)
+    lang = await language_of(callback.from_user)
     if not user:
-        await callback.message.edit_text("❌ Пользователь не найден.", reply_markup=back_button)
+        await render(callback, t(lang, "user_not_found"), reply_markup=BACK_KEYBOARDS[lang])
         return
 
     bot_username = "Facevpn_bot"
     referral_link = f"https://t.me/{bot_username}?start={user.tg_id}"
 
-    text = (
-        f"🔗 *Ваша реферальная система*\n\n"
-        f"👥 Приглашено пользователей: *{user.referrals_count}*\n\n"
-        f"📌 Ваша реферальная ссылка:\n"
-        f"`{referral_link}`"
-    )
-    await callback.message.edit_text(text, reply_markup=back_button, parse_mode="Markdown")
+    text = t(lang, "referral", referrals_count=user.referrals_count, link=referral_link)
+    await render(callback, text, reply_markup=BACK_KEYBOARDS[lang], parse_mode="Markdown")
 
 @router.callback_query(F.data == "check_ref")
 async def admin_check_ref(callback: CallbackQuery, state: FSMContext):
+    lang = await language_of(callback.from_user)
     if callback.from_user.username not in ADMINS:
-        await callback.answer("❌ Только админ может использовать эту кнопку.", show_alert=True)
+        await callback.answer(t(lang, "admin_only"), show_alert=True)
         return
 
-    await callback.message.edit_text("Введите @username пользователя для проверки его рефералов:")
+    await render(callback, t(lang, "admin_enter_username"))
     await state.set_state(AdminCheck.waiting_for_username)
 
 @router.message(AdminCheck.waiting_for_username)
 async def admin_receive_username(message, state: FSMContext):
     username = message.text.lstrip("@")
     user = await get_user_by_username(username)
+    lang = await language_of(message.from_user)
 
     if not user:
-        await message.answer("❌ Пользователь не найден.")
+        await message.answer(t(lang, "user_not_found"))
     else:
-        await message.answer(f"👥 Пользователь @{username} пригласил {user.referrals_count} пользователей.", reply_markup=back_button)
+        await message.answer(t(lang, "admin_user_referrals", username=username, count=user.referrals_count),
+                             reply_markup=BACK_KEYBOARDS[lang])
 
     await state.clear()
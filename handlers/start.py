@@ -1,33 +1,22 @@
 from aiogram import Router, F
 from aiogram.filters import CommandStart
 from aiogram.enums import ParseMode
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
-from database.crud import create_user, get_user_by_tg
-from keyboards.main import start_buttons, generate_fruit_captcha
-from datetime import datetime, timedelta
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
+from database.crud import create_user, get_user_by_tg, user_language
+from keyboards.main import START_KEYBOARDS, generate_fruit_captcha
+from locales import t, language_of, normalize_language
+from message_render import render
 
 router = Router()
 captcha_answers = {}
 
 ADMINS = ["enjoyoneday", "whatyousayah"]
 
-start_text = """
-👋 Добро пожаловать в FaceVPN — твой личный щит в интернете 🛡️
-🔐 Безопасность данных, скрытие IP, стабильный доступ к контенту.
-🌍 Подключение к серверам по всему миру!
-"""
-
-def get_start_buttons(username: str) -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[row[:] for row in start_buttons.inline_keyboard])
-    if username in ADMINS:
-        keyboard.inline_keyboard.insert(
-            0,
-            [InlineKeyboardButton(text="Проверить рефералов 🕵️‍♂️", callback_data="check_ref")]
-        )
-    return keyboard
+def get_start_buttons(username: str, lang: str) -> InlineKeyboardMarkup:
+    return START_KEYBOARDS[lang, username in ADMINS]
 
-def generate_captcha():
-    return generate_fruit_captcha()
+def generate_captcha(lang: str):
+    return generate_fruit_captcha(lang)
 
 @router.message(CommandStart())
 async def start_handler(message: Message, command: CommandStart):
@@ -35,8 +24,9 @@ async def start_handler(message: Message, command: CommandStart):
         return
 
     user = await get_user_by_tg(message.from_user.id)
+    lang = await language_of(message.from_user)
     if user:
-        await message.answer(start_text, reply_markup=get_start_buttons(message.from_user.username), parse_mode=ParseMode.HTML)
+        await message.answer(t(lang, "start"), reply_markup=get_start_buttons(message.from_user.username, lang), parse_mode=ParseMode.HTML)
         return
 
     args = command.args
@@ -47,11 +37,11 @@ async def start_handler(message: Message, command: CommandStart):
         except ValueError:
             ref_code = None
 
-    correct, keyboard = generate_captcha()
+    correct, keyboard = generate_captcha(lang)
     captcha_answers[message.from_user.id] = {"correct": correct, "ref_code": ref_code}
 
     await message.answer(
-        f"Привет! Чтобы подтвердить, что вы человек, выберите фрукт: {correct}",
+        t(lang, "captcha_prompt", fruit=t(lang, f"fruit_{correct}")),
         reply_markup=keyboard,
         parse_mode=ParseMode.HTML
     )
@@ -61,49 +51,51 @@ async def captcha_callback(callback: CallbackQuery):
     user_id = callback.from_user.id
     selected = callback.data.replace("captcha_", "")
     data = captcha_answers.get(user_id)
+    lang = await language_of(callback.from_user)
 
     if not data:
-        await callback.answer("❌ Время капчи истекло, попробуйте снова.", show_alert=True)
+        await callback.answer(t(lang, "captcha_expired"), show_alert=True)
         return
 
     if selected == data["correct"]:
-        user = await create_user(
+        # Ответ забирается до await: из двух одновременных верных ответов регистрирует только первый
+        if captcha_answers.pop(user_id, None) is None:
+            await callback.answer()
+            return
+
+        user, referrer_credited = await create_user(
             tg_id=user_id,
             username=callback.from_user.username,
             full_name=callback.from_user.full_name,
-            ref_code=data["ref_code"]
+            ref_code=data["ref_code"],
+            language=lang
         )
 
-        if data["ref_code"] and data["ref_code"] != user_id:
-            referrer = await get_user_by_tg(data["ref_code"])
-            if referrer:
-                referrer.is_premium = True
-                if not referrer.premium_until:
-                    referrer.premium_until = datetime.utcnow() + timedelta(days=7)
-                else:
-                    referrer.premium_until += timedelta(days=7)
-                try:
-                    await callback.bot.send_message(
-                        referrer.tg_id,
-                        "🎉 Ваш приглашенный пользователь прошел регистрацию! Вам начислено +7 дней премиума."
-                    )
-                except:
-                    pass
-
-        captcha_answers.pop(user_id)
-        await callback.message.edit_text(
-            "✅ Проверка пройдена!\n" + start_text,
-            reply_markup=get_start_buttons(callback.from_user.username),
+        if referrer_credited:
+            try:
+                await callback.bot.send_message(
+                    data["ref_code"],
+                    t(normalize_language(await user_language(data["ref_code"])), "referral_registered")
+                )
+            except:
+                pass
+
+        await render(
+            callback,
+            t(lang, "captcha_passed") + t(lang, "start"),
+            reply_markup=get_start_buttons(callback.from_user.username, lang),
             parse_mode=ParseMode.HTML
         )
     else:
-        await callback.answer("❌ Неверно! Попробуйте снова.", show_alert=True)
+        await callback.answer(t(lang, "captcha_wrong"), show_alert=True)
 
 @router.callback_query(F.data == "back_button")
 async def back_button(callback: CallbackQuery):
-    await callback.message.edit_text(
-        start_text,
-        reply_markup=get_start_buttons(callback.from_user.username),
+    lang = await language_of(callback.from_user)
+    await render(
+        callback,
+        t(lang, "start"),
+        reply_markup=get_start_buttons(callback.from_user.username, lang),
         parse_mode=ParseMode.HTML
     )
 
@@ -4,15 +4,17 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import StateFilter
-from database.crud import get_user_by_tg, add_balance, extend_premium
-from keyboards.payments import fill_up_balance, choose_payment_method
+from database.crud import get_user_by_tg, credit_payment
+from keyboards.main import BACK_KEYBOARDS
+from keyboards.payments import FILL_UP_KEYBOARDS, PAYMENT_METHOD_KEYBOARDS
 import os
 import logging
 import requests
 from dotenv import load_dotenv
+from message_render import render
+from locales import t, language_of
 
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 CRYPTOBOT_TOKEN = os.getenv("CRYPTOBOT_TOKEN")
@@ -45,22 +47,26 @@ class PaymentStates(StatesGroup):
 
 @router.callback_query(F.data == "subscribe")
 async def subscribe_menu(callback: CallbackQuery):
-    logger.info(f"User {callback.from_user.id} opened subscription menu")
-    await callback.message.edit_text(
-        f"🔍 <b>Выберите сумму для пополнения: </b>",
-        reply_markup=fill_up_balance,
+    logger.info("User %s opened subscription menu", callback.from_user.id)
+    lang = await language_of(callback.from_user)
+    await render(
+        callback,
+        t(lang, "fill_up_prompt"),
+        reply_markup=FILL_UP_KEYBOARDS[lang],
         parse_mode=ParseMode.HTML
     )
 
 @router.callback_query(F.data.startswith("fill_up_"))
 async def process_fill_up(callback: CallbackQuery, state: FSMContext):
     amount_rub = int(callback.data.split("_")[2])
-    logger.info(f"User {callback.from_user.id} selected amount {amount_rub}₽")
+    logger.info("User %s selected amount %s₽", callback.from_user.id, amount_rub)
     await state.set_state(PaymentStates.waiting_payment)
     await state.update_data(selected_amount=amount_rub)
-    await callback.message.edit_text(
-        f"🔍 <b>Вы выбрали пополнение на {amount_rub}₽. Выберите способ оплаты:</b>",
-        reply_markup=choose_payment_method,
+    lang = await language_of(callback.from_user)
+    await render(
+        callback,
+        t(lang, "fill_up_selected", amount=amount_rub),
+        reply_markup=PAYMENT_METHOD_KEYBOARDS[lang],
         parse_mode=ParseMode.HTML
     )
 
@@ -69,38 +75,39 @@ async def pay_with_cryptobot(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     amount_rub = data.get("selected_amount")
     if not amount_rub:
-        logger.error(f"User {callback.from_user.id}: No amount selected")
-        await callback.answer("❌ Ошибка: сумма не выбрана.", show_alert=True)
+        logger.error("User %s: No amount selected", callback.from_user.id)
+        await callback.answer(t(await language_of(callback.from_user), "payment_no_amount"), show_alert=True)
         return
 
     user = await get_user_by_tg(callback.from_user.id)
+    lang = await language_of(callback.from_user)
     if not user:
-        logger.error(f"User {callback.from_user.id} not found")
-        await callback.answer("❌ Ошибка: пользователь не найден.", show_alert=True)
+        logger.error("User %s not found", callback.from_user.id)
+        await callback.answer(t(lang, "payment_user_not_found"), show_alert=True)
         return
 
     usdt_amount = next((usdt for usdt, rub in RUB_RATES.items() if rub == amount_rub), amount_rub / 80)
-    logger.info(f"Creating invoice for user {callback.from_user.id}: {amount_rub}₽ ({usdt_amount:.2f} USDT)")
+    logger.info("Creating invoice for user %s: %s₽ (%.2f USDT)", callback.from_user.id, amount_rub, usdt_amount)
 
     pay_url, invoice_id = create_invoice(usdt_amount)
     if pay_url and invoice_id:
         invoices[callback.message.chat.id] = invoice_id
-        logger.info(f"Invoice created for user {callback.from_user.id}: {pay_url}")
-        await callback.message.edit_text(
-            f"💸 <b>Оплатите {amount_rub}₽ ({usdt_amount:.2f} USDT):</b>\n{pay_url}\n\n"
-            f"Если ссылка не открывает чат с @{CRYPTOBOT_NAME}, откройте @CryptoTestnetBot и введите /start pay_{invoice_id}\n"
-            f"Нажмите 'Проверить оплату' после завершения.",
+        logger.info("Invoice created for user %s: %s", callback.from_user.id, pay_url)
+        await render(
+            callback,
+            t(lang, "invoice", amount=amount_rub, usdt=usdt_amount, url=pay_url,
+              bot=CRYPTOBOT_NAME, invoice_id=invoice_id),
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=f"💎 Оплатить {usdt_amount:.2f} USDT", url=pay_url)],
-                [InlineKeyboardButton(text="✅ Проверить оплату", callback_data=f"check_{invoice_id}")],
-                [InlineKeyboardButton(text="🔙 Назад", callback_data="back")]
+                [InlineKeyboardButton(text=t(lang, "btn_pay", usdt=usdt_amount), url=pay_url)],
+                [InlineKeyboardButton(text=t(lang, "btn_check_payment"), callback_data=f"check_{invoice_id}")],
+                [InlineKeyboardButton(text=t(lang, "btn_back"), callback_data="back")]
             ]),
             parse_mode=ParseMode.HTML
         )
         await state.update_data(invoice_id=invoice_id, usdt_amount=usdt_amount)
     else:
-        logger.error(f"Invoice creation failed for user {callback.from_user.id}: No pay_url or invoice_id")
-        await callback.answer("❌ Не удалось создать счёт. Проверьте токен или попробуйте позже.", show_alert=True)
+        logger.error("Invoice creation failed for user %s: No pay_url or invoice_id", callback.from_user.id)
+        await callback.answer(t(lang, "invoice_failed"), show_alert=True)
 
 @router.callback_query(F.data.startswith("check_"), StateFilter(PaymentStates.waiting_payment))
 async def check_payment(callback: CallbackQuery, state: FSMContext):
@@ -110,7 +117,7 @@ async def check_payment(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     amount_rub = data.get("selected_amount")
 
-    logger.info(f"Checking payment for user {telegram_id}, invoice {invoice_id}")
+    logger.info("Checking payment for user %s, invoice %s", telegram_id, invoice_id)
 
     status_response = check_invoice_status(invoice_id)
     if status_response and status_response.get("ok"):
@@ -121,53 +128,50 @@ async def check_payment(callback: CallbackQuery, state: FSMContext):
             usdt_amount = float(invoice["amount"])
             rub_amount = RUB_RATES.get(round(usdt_amount, 1), usdt_amount * 80)
 
-            add_balance(telegram_id, rub_amount)
             days = PREMIUM_DAYS.get(amount_rub, 0)
+            await credit_payment(telegram_id, rub_amount, days)
+            # credit_payment уже положил язык пользователя в кэш
+            lang = await language_of(callback.from_user)
+            text = t(lang, "payment_success", amount=rub_amount)
             if days > 0:
-                await extend_premium(telegram_id, days)
-                logger.info(f"User {telegram_id} balance updated: {rub_amount}₽, premium extended: {days} days")
-                await callback.message.edit_text(
-                    f"✅ Оплата на {rub_amount}₽ прошла!\nБаланс: {rub_amount:.2f}₽\nПремиум продлён на {days} дней.",
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="🔙 Назад", callback_data="back_button")]
-                    ]),
-                    parse_mode=ParseMode.HTML
-                )
+                logger.info("User %s balance updated: %s₽, premium extended: %s days", telegram_id, rub_amount, days)
+                text += t(lang, "payment_premium_extended", days=days)
             else:
-                logger.info(f"User {telegram_id} balance updated: {rub_amount}₽, no premium extension")
-                await callback.message.edit_text(
-                    f"✅ Оплата на {rub_amount}₽ прошла!\nБаланс: {rub_amount:.2f}₽",
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="🔙 Назад", callback_data="back_button")]
-                    ]),
-                    parse_mode=ParseMode.HTML
-                )
+                logger.info("User %s balance updated: %s₽, no premium extension", telegram_id, rub_amount)
+            await render(
+                callback,
+                text,
+                reply_markup=BACK_KEYBOARDS[lang],
+                parse_mode=ParseMode.HTML
+            )
 
             try:
                 with open("qw.docx", "rb") as file:
                     await callback.message.answer_document(document=file)
-                logger.info(f"Sent qw.docx to user {telegram_id}")
+                logger.info("Sent qw.docx to user %s", telegram_id)
             except FileNotFoundError:
-                logger.error(f"File qw.docx not found for user {telegram_id}")
-                await callback.message.answer("⚠️ Файл qw.docx не найден.", parse_mode=ParseMode.HTML)
+                logger.error("File qw.docx not found for user %s", telegram_id)
+                await callback.message.answer(t(lang, "payment_file_missing"), parse_mode=ParseMode.HTML)
 
             invoices.pop(chat_id, None)
             await state.clear()
         else:
-            logger.info(f"Payment not completed for user {telegram_id}, invoice {invoice_id}")
-            await callback.answer("❌ Ещё не оплачено.", show_alert=True)
+            logger.info("Payment not completed for user %s, invoice %s", telegram_id, invoice_id)
+            await callback.answer(t(await language_of(callback.from_user), "payment_not_paid"), show_alert=True)
     else:
-        logger.error(f"Failed to check invoice {invoice_id} for user {telegram_id}")
-        await callback.answer("⚠️ Не удалось получить статус оплаты.", show_alert=True)
+        logger.error("Failed to check invoice %s for user %s", invoice_id, telegram_id)
+        await callback.answer(t(await language_of(callback.from_user), "payment_status_failed"), show_alert=True)
 
 @router.callback_query(F.data == "back")
 async def back_to_menu(callback: CallbackQuery, state: FSMContext):
-    logger.info(f"User {callback.from_user.id} returned to main menu")
+    logger.info("User %s returned to main menu", callback.from_user.id)
     await state.clear()
-    from handlers.start import start_text, get_start_buttons
-    await callback.message.edit_text(
-        start_text,
-        reply_markup=get_start_buttons(callback.from_user.username),
+    from handlers.start import get_start_buttons
+    lang = await language_of(callback.from_user)
+    await render(
+        callback,
+        t(lang, "start"),
+        reply_markup=get_start_buttons(callback.from_user.username, lang),
         parse_mode=ParseMode.HTML
     )
 
@@ -180,17 +184,17 @@ def create_invoice(amount):
     }
     try:
         response = requests.post(f"{CRYPTOBOT_API_URL}/createInvoice", headers=headers, json=data)
-        logger.debug(f"Create invoice response: {response.status_code} {response.text}")
+        logger.debug("Create invoice response: %s %s", response.status_code, response.text)
         if response.ok:
             resp_data = response.json()
             if resp_data.get("ok"):
                 return resp_data["result"]["pay_url"], resp_data["result"]["invoice_id"]
             else:
-                logger.error(f"API error: {resp_data.get('error', 'No error details')}")
+                logger.error("API error: %s", resp_data.get("error", "No error details"))
         else:
-            logger.error(f"HTTP error: {response.status_code} {response.text}")
+            logger.error("HTTP error: %s %s", response.status_code, response.text)
     except Exception as e:
-        logger.error(f"Request failed: {str(e)}")
+        logger.error("Request failed: %s", e)
     return None, None
 
 def check_invoice_status(invoice_id):
@@ -198,11 +202,11 @@ def check_invoice_status(invoice_id):
     data = {"invoice_ids": [invoice_id]}
     try:
         response = requests.post(f"{CRYPTOBOT_API_URL}/getInvoices", headers=headers, json=data)
-        logger.debug(f"Check invoice response: {response.status_code} {response.text}")
+        logger.debug("Check invoice response: %s %s", response.status_code, response.text)
         if response.ok:
             return response.json()
         else:
-            logger.error(f"HTTP error: {response.status_code} {response.text}")
+            logger.error("HTTP error: %s %s", response.status_code, response.text)
     except Exception as e:
-        logger.error(f"Request failed: {str(e)}")
+        logger.error("Request failed: %s", e)
     return None
\ No newline at end of file
@@ -1,43 +1,65 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 import random
+from locales import CATALOGS, DEFAULT_LANGUAGE, LANGUAGES
 
-start_buttons = InlineKeyboardMarkup(inline_keyboard=[
-    [InlineKeyboardButton(text="Настройки VPN ⚙", callback_data="settings")],
-    [InlineKeyboardButton(text="Продлить подписку 💸", callback_data="subscribe")],
-    [InlineKeyboardButton(text="Профиль 👤", callback_data="profile")],
-    [InlineKeyboardButton(text="Рефералка 🤝", callback_data="referral")],
-    [InlineKeyboardButton(text="Новости 💾", url="https://t.me/facevpnnews")],
-    [InlineKeyboardButton(text="Поддержка 📞", callback_data="support")],
-    [InlineKeyboardButton(text="Лицензионное соглашение 📃", callback_data="license")]
-])
-
-setting_buttons = InlineKeyboardMarkup(inline_keyboard=[
-    [InlineKeyboardButton(text="Для телефона 📱", callback_data="Phone")],
-    [InlineKeyboardButton(text="Для ПК 💻", callback_data="PC")],
-    [InlineKeyboardButton(text="В главное меню 🔙", callback_data="back_button")]
-])
-
-back_button = InlineKeyboardMarkup(inline_keyboard=[
-    [InlineKeyboardButton(text="В главное меню 🔙", callback_data="back_button")]
-])
-
-support_button = InlineKeyboardMarkup(inline_keyboard=[
-    [InlineKeyboardButton(text="Чат с поддержкой 🆘", url="https://t.me/facevpnsupport")],
-    [InlineKeyboardButton(text="В главное меню 🔙", callback_data="back_button")]
-])
-
-def generate_fruit_captcha():
-    fruits = ["🍎 Яблоко", "🍌 Банан", "🍇 Виноград", "🍉 Арбуз", "🍒 Вишня", "🥝 Киви"]
-    correct = random.choice(fruits)
+def _button(lang, key, **kwargs):
+    return InlineKeyboardButton(text=CATALOGS[lang][key], **kwargs)
+
+def _start_keyboard(lang: str, is_admin: bool) -> InlineKeyboardMarkup:
+    rows = [
+        [_button(lang, "btn_settings", callback_data="settings")],
+        [_button(lang, "btn_subscribe", callback_data="subscribe")],
+        [_button(lang, "btn_profile", callback_data="profile")],
+        [_button(lang, "btn_referral", callback_data="referral")],
+        [_button(lang, "btn_news", url="https://t.me/facevpnnews")],
+        [_button(lang, "btn_support", callback_data="support")],
+        [_button(lang, "btn_license", callback_data="license")]
+    ]
+    if is_admin:
+        rows[:0] = [
+            [_button(lang, "btn_check_ref", callback_data="check_ref")],
+            [_button(lang, "btn_stats", callback_data="admin_stats")]
+        ]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+# Клавиатуры собираются один раз на язык (и роль) и дальше только отдаются из словарей,
+# поэтому их нельзя изменять на месте
+START_KEYBOARDS = {(lang, is_admin): _start_keyboard(lang, is_admin) for lang in LANGUAGES for is_admin in (False, True)}
+
+SETTING_KEYBOARDS = {lang: InlineKeyboardMarkup(inline_keyboard=[
+    [_button(lang, "btn_phone", callback_data="Phone")],
+    [_button(lang, "btn_pc", callback_data="PC")],
+    [_button(lang, "btn_main_menu", callback_data="back_button")]
+]) for lang in LANGUAGES}
+
+BACK_KEYBOARDS = {lang: InlineKeyboardMarkup(inline_keyboard=[
+    [_button(lang, "btn_main_menu", callback_data="back_button")]
+]) for lang in LANGUAGES}
+
+SUPPORT_KEYBOARDS = {lang: InlineKeyboardMarkup(inline_keyboard=[
+    [_button(lang, "btn_support_chat", url="https://t.me/facevpnsupport")],
+    [_button(lang, "btn_main_menu", callback_data="back_button")]
+]) for lang in LANGUAGES}
+
+start_buttons = START_KEYBOARDS[DEFAULT_LANGUAGE, False]
+setting_buttons = SETTING_KEYBOARDS[DEFAULT_LANGUAGE]
+back_button = BACK_KEYBOARDS[DEFAULT_LANGUAGE]
+support_button = SUPPORT_KEYBOARDS[DEFAULT_LANGUAGE]
+
+FRUITS = ("apple", "banana", "grapes", "watermelon", "cherry", "kiwi")
+
+def generate_fruit_captcha(lang: str = DEFAULT_LANGUAGE):
+    # В callback_data идет id фрукта, а не подпись: ответ не зависит от языка кнопок
+    correct = random.choice(FRUITS)
     options = [correct]
     while len(options) < 4:
-        fruit = random.choice(fruits)
+        fruit = random.choice(FRUITS)
         if fruit not in options:
             options.append(fruit)
     random.shuffle(options)
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text=fruit, callback_data=f"captcha_{fruit}")] for fruit in options
+            [_button(lang, f"fruit_{fruit}", callback_data=f"captcha_{fruit}")] for fruit in options
         ]
     )
-    return correct, keyboard
\ No newline at end of file
+    return correct, keyboard
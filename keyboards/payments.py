@@ -1,15 +1,22 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from keyboards.main import _button
+from locales import CATALOGS, DEFAULT_LANGUAGE, LANGUAGES
 
-fill_up_balance = InlineKeyboardMarkup(inline_keyboard=[
-    [InlineKeyboardButton(text="💸 199₽", callback_data="fill_up_199"),
-     InlineKeyboardButton(text="💸 300₽", callback_data="fill_up_300")],
-    [InlineKeyboardButton(text="💸 500₽", callback_data="fill_up_500"),
-     InlineKeyboardButton(text="💸 1000₽", callback_data="fill_up_1000")],
-    [InlineKeyboardButton(text="🔙 Назад", callback_data="back")]
-])
-
-choose_payment_method = InlineKeyboardMarkup(inline_keyboard=[
-    [InlineKeyboardButton(text="💎 CryptoBot", callback_data="pay_cryptobot"),
-     InlineKeyboardButton(text="💳 Карта(скоро)", callback_data="pay_bycard")],
-    [InlineKeyboardButton(text="🔙 Назад", callback_data="back")]
-])
\ No newline at end of file
+def _amount_button(lang, amount):
+    return InlineKeyboardButton(text=CATALOGS[lang]["btn_amount"].format(amount=amount),
+                                callback_data=f"fill_up_{amount}")
+
+FILL_UP_KEYBOARDS = {lang: InlineKeyboardMarkup(inline_keyboard=[
+    [_amount_button(lang, 199), _amount_button(lang, 300)],
+    [_amount_button(lang, 500), _amount_button(lang, 1000)],
+    [_button(lang, "btn_back", callback_data="back")]
+]) for lang in LANGUAGES}
+
+PAYMENT_METHOD_KEYBOARDS = {lang: InlineKeyboardMarkup(inline_keyboard=[
+    [_button(lang, "btn_cryptobot", callback_data="pay_cryptobot"),
+     _button(lang, "btn_card_soon", callback_data="pay_bycard")],
+    [_button(lang, "btn_back", callback_data="back")]
+]) for lang in LANGUAGES}
+
+fill_up_balance = FILL_UP_KEYBOARDS[DEFAULT_LANGUAGE]
+choose_payment_method = PAYMENT_METHOD_KEYBOARDS[DEFAULT_LANGUAGE]
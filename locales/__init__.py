@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+from types import MappingProxyType
+
+LOCALES_DIR = Path(__file__).parent
+DEFAULT_LANGUAGE = "ru"
+
+def _load_catalogs():
+    """Читает все <язык>.json один раз; недостающие ключи берутся из языка по умолчанию"""
+    raw = {}
+    for path in sorted(LOCALES_DIR.glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            raw[path.stem] = json.load(f)
+    default = raw[DEFAULT_LANGUAGE]
+    return MappingProxyType({
+        lang: MappingProxyType({**default, **messages}) for lang, messages in raw.items()
+    })
+
+CATALOGS = _load_catalogs()
+LANGUAGES = frozenset(CATALOGS)
+BYTE_UNITS = MappingProxyType({lang: tuple(CATALOGS[lang]["byte_units"].split(",")) for lang in LANGUAGES})
+
+def t(lang: str, key: str, **kwargs) -> str:
+    """Строка каталога; lang должен быть из LANGUAGES (см. language_of)"""
+    text = CATALOGS[lang][key]
+    return text.format(**kwargs) if kwargs else text
+
+def format_bytes(lang: str, size: int) -> str:
+    """1536 -> '1.5 КБ'"""
+    units = BYTE_UNITS[lang]
+    value = float(size)
+    for unit in units[:-1]:
+        if value < 1024:
+            break
+        value /= 1024
+    else:
+        unit = units[-1]
+    return f"{value:.0f} {unit}" if unit == units[0] else f"{value:.1f} {unit}"
+
+def normalize_language(code: str | None) -> str:
+    """'en-US' -> 'en'; неподдерживаемые языки -> DEFAULT_LANGUAGE"""
+    if code:
+        code = code.split("-", 1)[0].lower()
+        if code in LANGUAGES:
+            return code
+    return DEFAULT_LANGUAGE
+
+async def language_of(tg_user) -> str:
+    """Язык пользователя — всегда сохраненный User.language (читается из БД один раз и кэшируется).
+    language_code из Telegram используется только для еще не зарегистрированных"""
+    from database.crud import user_language
+    return normalize_language(await user_language(tg_user.id, normalize_language(tg_user.language_code)))
@@ -0,0 +1,222 @@
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+update_id_var: ContextVar[int | None] = ContextVar("update_id", default=None)
+user_id_var: ContextVar[int | None] = ContextVar("user_id", default=None)
+route_var: ContextVar[str | None] = ContextVar("route", default=None)
+
+QUEUE_SIZE = 10000
+
+# Доля INFO/DEBUG записей, которые пишем для частых маршрутов
+ROUTE_SAMPLING = {
+    "subscribe": 0.1,
+    "back": 0.1,
+    "back_button": 0.1,
+    "profile": 0.2,
+}
+
+# Не более ERROR_BURST одинаковых ошибок за ERROR_WINDOW секунд; различных ошибок
+# помнится не больше ERROR_KEYS (сообщения с id/f-строками уникальны)
+ERROR_BURST = 5
+ERROR_WINDOW = 60
+ERROR_KEYS = 1000
+
+_RECORD_FIELDS = {"update_id", "user_id", "route", "suppressed", "dropped"}
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи update id, user id и маршрут текущего апдейта"""
+
+    def filter(self, record):
+        record.update_id = update_id_var.get()
+        record.user_id = user_id_var.get()
+        record.route = route_var.get()
+        return True
+
+
+class RouteSamplingFilter(logging.Filter):
+    """Семплирует INFO/DEBUG записи частых маршрутов, WARNING и выше проходят всегда"""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "route", None))
+        return rate is None or random.random() < rate
+
+
+class ErrorRateLimitFilter(logging.Filter):
+    """Ограничивает поток одинаковых ошибок; число подавленных пишется в следующую запись"""
+
+    def __init__(self, burst: int = ERROR_BURST, window: float = ERROR_WINDOW, max_keys: int = ERROR_KEYS):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # (logger, msg) -> (начало окна, число, подавлено)
+        self._pruned_at = time.monotonic()
+
+    def _prune(self, now):
+        """Удаляет ключи с истекшим окном, не чаще раза в окно"""
+        if now - self._pruned_at < self.window:
+            return
+        self._pruned_at = now
+        for key in [key for key, (started, _, _) in self._buckets.items() if now - started >= self.window]:
+            del self._buckets[key]
+
+    def filter(self, record):
+        if record.levelno < logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        self._prune(now)
+        started, count, suppressed = self._buckets.get(key, (now, 0, 0))
+        if now - started >= self.window:
+            started, count = now, 0
+        allowed = count < self.burst
+        if allowed:
+            if suppressed:
+                record.suppressed = suppressed
+            self._buckets[key] = (started, count + 1, 0)
+        else:
+            self._buckets[key] = (started, count, suppressed + 1)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler, который оставляет потоку event loop только msg % args.
+
+    Аргументы подставляются сразу: к моменту форматирования в потоке QueueListener
+    изменяемые объекты могли поменяться, а ORM-объекты — полезть в БД. JSON, traceback
+    и запись в поток делаются уже в QueueListener.
+    При переполнении очереди запись отбрасывается, а не блокирует хендлер; dropped —
+    всего потерянных записей, число потерянных с прошлой записи уходит в поле dropped
+    следующей.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self._unreported:
+            record.dropped = self._unreported
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+        else:
+            self._unreported = 0
+
+
+_queue_handler: DeferredQueueHandler | None = None
+
+def dropped_records() -> int:
+    """Сколько записей лога потеряно из-за переполненной очереди"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in _RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: int = logging.INFO) -> QueueListener:
+    """Настраивает корневой логгер: JSON-записи через очередь, вывод в отдельном потоке.
+
+    Возвращает запущенный QueueListener; остановить его (и дописать очередь) — забота вызывающего.
+    """
+    global _queue_handler
+    log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+    queue_handler = _queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(RouteSamplingFilter(ROUTE_SAMPLING))
+    queue_handler.addFilter(ErrorRateLimitFilter())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+_ROUTE_ARG = re.compile(r"_[^_]*\d[^_]*$")
+
+def route_of(update: Update) -> str:
+    """Маршрут апдейта с низкой кардинальностью: callback_data без id/сумм или команда"""
+    if update.callback_query and update.callback_query.data:
+        data = update.callback_query.data
+        if data.startswith("captcha_"):
+            return "captcha"
+        return _ROUTE_ARG.sub("", data)
+    if update.message and update.message.text and update.message.text.startswith("/"):
+        return update.message.text[1:].split(maxsplit=1)[0]
+    return update.event_type
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Outer-middleware апдейтов: выставляет контекст логирования на время обработки"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        tokens = (
+            update_id_var.set(event.update_id),
+            user_id_var.set(user.id if user else None),
+            route_var.set(route_of(event)),
+        )
+        try:
+            return await handler(event, data)
+        finally:
+            route_var.reset(tokens[2])
+            user_id_var.reset(tokens[1])
+            update_id_var.reset(tokens[0])
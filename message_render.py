@@ -0,0 +1,86 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 10000
+# Минимальный интервал между правками сообщений в одном чате (сек)
+MIN_EDIT_INTERVAL = 0.5
+RETRY_ATTEMPTS = 3
+
+_rendered = OrderedDict()   # (chat_id, message_id) -> отпечаток последнего текста и клавиатуры
+_last_edit = OrderedDict()  # chat_id -> время последней правки
+_pending = {}               # (chat_id, message_id) -> номер самой свежей ожидающей правки
+_tickets = itertools.count()
+
+
+def _remember(cache: OrderedDict, key, value):
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _fingerprint(text: str, kwargs: dict) -> int:
+    markup = kwargs.get("reply_markup")
+    markup = markup.model_dump_json(exclude_none=True) if markup else None
+    return hash((text, markup, kwargs.get("parse_mode")))
+
+
+async def render(callback: CallbackQuery, text: str, **kwargs) -> bool:
+    """Редактирует сообщение колбэка, пропуская правки, которые ничего не меняют.
+
+    Повтор того же текста и клавиатуры превращается в callback.answer(); частые
+    правки одного сообщения склеиваются, выполняется только последняя; RetryAfter
+    обрабатывается здесь. kwargs передаются в edit_text как есть.
+    Возвращает True, если сообщение действительно было изменено.
+    """
+    message = callback.message
+    key = (message.chat.id, message.message_id)
+    fingerprint = _fingerprint(text, kwargs)
+    if _rendered.get(key) == fingerprint:
+        await callback.answer()
+        return False
+
+    ticket = next(_tickets)
+    _pending[key] = ticket
+    # Слот резервируется до ожидания, иначе правки разных сообщений чата проснутся одновременно
+    now = time.monotonic()
+    slot = max(now, _last_edit.get(message.chat.id, 0) + MIN_EDIT_INTERVAL)
+    _remember(_last_edit, message.chat.id, slot)
+    try:
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        # Билет остается в _pending до конца правки: повтор после RetryAfter тоже
+        # отменяется, если за время ожидания пришла более свежая правка
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            if _pending.get(key) != ticket or _rendered.get(key) == fingerprint:
+                await callback.answer()
+                return False
+            try:
+                await message.edit_text(text, **kwargs)
+                break
+            except TelegramRetryAfter as e:
+                if attempt == RETRY_ATTEMPTS:
+                    raise
+                logger.warning("Flood control in chat %s, retry in %ss", message.chat.id, e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except TelegramBadRequest as e:
+                if "message is not modified" not in e.message:
+                    raise
+                _remember(_rendered, key, fingerprint)
+                await callback.answer()
+                return False
+    finally:
+        if _pending.get(key) == ticket:
+            del _pending[key]
+
+    _remember(_rendered, key, fingerprint)
+    _remember(_last_edit, message.chat.id, max(_last_edit.get(message.chat.id, 0), time.monotonic()))
+    return True
@@ -0,0 +1,152 @@
+import os
+import re
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from logging_setup import route_of
+
+logger = logging.getLogger(__name__)
+
+# "" — выключено, "warn" — только предупреждения в лог, "strict" — превышение бюджета роняет апдейт
+MODE = os.getenv("DB_QUERY_BUDGET", "")
+
+# Сколько SQL-запросов может выполнить один апдейт маршрута. Бюджеты — для холодного кэша:
+# первое обращение пользователя после рестарта читает его язык (см. locales.language_of)
+ROUTE_BUDGETS = {
+    "start": 1,
+    "captcha": 5,
+    "back_button": 1,
+    "back": 1,
+    "settings": 1,
+    "Phone": 1,
+    "PC": 1,
+    "support": 1,
+    "license": 1,
+    "profile": 2,
+    "referral": 1,
+    "subscribe": 1,
+    "fill_up": 1,
+    "pay_cryptobot": 1,
+    "check": 4,
+    "admin_stats": 3,
+}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class QueryStats:
+    update_id: int | None
+    route: str | None
+    statements: int = 0
+    sessions: int = 0
+    round_trips: int = 0
+    queries: Counter = field(default_factory=Counter)
+
+    def repeated(self) -> dict:
+        """Одинаковые (текст + параметры) запросы, выполненные больше одного раза"""
+        return {query: count for query, count in self.queries.items() if count > 1}
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+_UNSAFE = re.compile(r"[^\w:.-]")
+
+
+def _tag(stats: QueryStats) -> str:
+    # Только маршрут: уникальный update_id сделал бы уникальным текст каждого запроса и
+    # сломал кэш подготовленных выражений и планов (asyncpg/Postgres); он есть в QueryStats и логах.
+    # route берется из callback_data, которую присылает клиент, поэтому в SQL-комментарий
+    # попадают только безопасные символы
+    route = _UNSAFE.sub("", stats.route or "-")
+    return f" /* route={route} */"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return statement, parameters
+    stats.statements += 1
+    stats.round_trips += 1
+    stats.queries[(statement, repr(parameters))] += 1
+    return statement + _tag(stats), parameters
+
+
+def _count_round_trip(conn):
+    stats = _current.get()
+    if stats is not None:
+        stats.round_trips += 1
+
+
+def _after_begin(session, transaction, connection):
+    stats = _current.get()
+    if stats is not None:
+        stats.sessions += 1
+
+
+def install(engines):
+    """Подписывается на события движков и ORM-сессий"""
+    for engine in engines:
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute, retval=True)
+        for name in ("begin", "commit", "rollback"):
+            event.listen(sync_engine, name, _count_round_trip)
+    event.listen(Session, "after_begin", _after_begin)
+
+
+def check_budget(stats: QueryStats, strict: bool = False):
+    logger.debug("Update %s route %s: %s statements, %s sessions, %s round trips",
+                 stats.update_id, stats.route, stats.statements, stats.sessions, stats.round_trips)
+    for (statement, parameters), count in stats.repeated().items():
+        logger.warning("Update %s route %s repeated query %s times: %s %s",
+                       stats.update_id, stats.route, count, statement, parameters)
+
+    budget = ROUTE_BUDGETS.get(stats.route)
+    if budget is not None and stats.statements > budget:
+        message = (f"Update {stats.update_id} route {stats.route} used {stats.statements} statements "
+                   f"({stats.sessions} sessions, {stats.round_trips} round trips), budget is {budget}")
+        if strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+@asynccontextmanager
+async def track_queries(route: str, update_id: int = None, strict: bool = True):
+    """Считает запросы внутри блока; для тестов и скриптов:
+
+        async with track_queries("profile") as stats:
+            await profile_handler(callback)
+    """
+    stats = QueryStats(update_id, route)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+    check_budget(stats, strict)
+
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """Outer-middleware апдейтов: учет запросов каждого апдейта и проверка бюджета маршрута"""
+
+    def __init__(self, strict: bool = False):
+        self.strict = strict
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with track_queries(route_of(event), event.update_id, self.strict):
+            return await handler(event, data)
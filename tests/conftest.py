@@ -0,0 +1,136 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+# database.session читает окружение при импорте, поэтому оно выставляется до любых импортов проекта:
+# primary и две реплики — отдельные SQLite-файлы (репликации между ними нет)
+_tmp = tempfile.mkdtemp(prefix="facevpn-tests-")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_tmp}/primary.db"
+os.environ["DB_REPLICA_URLS"] = ",".join(f"sqlite+aiosqlite:///{_tmp}/replica{i}.db" for i in range(2))
+os.environ["BOT_TOKEN"] = "123456:TEST"
+
+import pytest
+from sqlalchemy import event
+
+import query_budget
+from database import crud, session
+from database.models import Base, User
+from database.stats import init_stats
+
+# Счетчики запросов работают только внутри track_queries, вне его слушатели ничего не делают
+query_budget.install([session.engine, *session.replica_engines])
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite проверяет внешние ключи только с этим pragma, Postgres — всегда
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+for _engine in (session.engine, *session.replica_engines):
+    event.listen(_engine.sync_engine, "connect", _enable_foreign_keys)
+
+
+@pytest.fixture
+async def db():
+    """Чистые схемы на primary и репликах, сброшенное состояние роутинга"""
+    for engine in (session.engine, *session.replica_engines):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    await init_stats()
+    session._healthy.update(range(len(session.replica_engines)))
+    session._recent_writes.clear()
+    crud._languages.clear()
+    yield session
+    for engine in (session.engine, *session.replica_engines):
+        await engine.dispose()
+
+
+@pytest.fixture
+async def primary_only(db):
+    """Реплики выведены из ротации: все чтения идут на primary, как без DB_REPLICA_URLS"""
+    db._healthy.clear()
+    yield db
+
+
+async def add_user(session_maker, **values) -> User:
+    # id строки заведомо не совпадает с tg_id, чтобы их путаница не проходила незамеченной
+    values.setdefault("id", values["tg_id"] + 1000)
+    async with session_maker() as s:
+        user = User(**values)
+        s.add(user)
+        await s.commit()
+        return user
+
+
+class StubMessage:
+    def __init__(self, chat_id: int, message_id: int = 1):
+        self.chat = SimpleNamespace(id=chat_id)
+        self.message_id = message_id
+        self.edits = []
+        self.answers = []
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append((text, kwargs))
+
+    async def answer(self, text, **kwargs):
+        self.answers.append((text, kwargs))
+
+    async def answer_document(self, document, **kwargs):
+        self.answers.append((document, kwargs))
+
+
+class StubBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class StubState:
+    def __init__(self, **data):
+        self.data = data
+        self.state = None
+
+    async def get_data(self):
+        return dict(self.data)
+
+    async def update_data(self, **data):
+        self.data.update(data)
+
+    async def set_state(self, state):
+        self.state = state
+
+    async def clear(self):
+        self.data.clear()
+        self.state = None
+
+
+class StubCallback:
+    """Минимальный CallbackQuery для прямого вызова хендлеров"""
+
+    def __init__(self, data: str, user_id: int = 1, username: str = None, language_code: str = "ru",
+                 message: StubMessage = None, bot: StubBot = None):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id, username=username, full_name=f"User {user_id}",
+                                         language_code=language_code, is_bot=False)
+        self.message = message or StubMessage(user_id)
+        self.bot = bot or StubBot()
+        self.answers = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+
+@pytest.fixture
+def render_cache(monkeypatch):
+    """Пустой кэш message_render и без пауз между правками"""
+    import message_render
+    message_render._rendered.clear()
+    message_render._last_edit.clear()
+    message_render._pending.clear()
+    monkeypatch.setattr(message_render, "MIN_EDIT_INTERVAL", 0)
+    return message_render
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from database import crud
+from locales import language_of, t
+from query_budget import track_queries
+from tests.conftest import StubBot, StubCallback, StubState, add_user
+
+
+def tg_user(user_id, language_code):
+    return SimpleNamespace(id=user_id, language_code=language_code)
+
+
+async def test_stored_language_wins_over_telegram(primary_only):
+    await add_user(primary_only.async_session, tg_id=1, language="en")
+
+    async with track_queries("language") as stats:
+        assert await language_of(tg_user(1, "ru")) == "en"
+    assert stats.statements == 1
+
+    # Второе обращение — из кэша, смена языка клиента Telegram ничего не меняет
+    async with track_queries("language") as stats:
+        assert await language_of(tg_user(1, "ru")) == "en"
+        assert await language_of(tg_user(1, None)) == "en"
+    assert stats.statements == 0
+
+
+async def test_unregistered_user_registers_with_telegram_language(primary_only):
+    assert await language_of(tg_user(1, "en-US")) == "en"
+    await crud.create_user(1, "new", language="en")
+    crud._languages.clear()
+    assert await language_of(tg_user(1, "ru")) == "en"
+
+
+async def test_referrer_notified_in_stored_language(primary_only, render_cache):
+    from handlers.start import captcha_answers, captcha_callback
+
+    await add_user(primary_only.async_session, tg_id=1, language="en")
+    captcha_answers[2] = {"correct": "apple", "ref_code": 1}
+    bot = StubBot()
+    await captcha_callback(StubCallback("captcha_apple", user_id=2, language_code="ru", bot=bot))
+
+    assert bot.sent == [(1, t("en", "referral_registered"))]
+    assert crud._languages[1] == "en"
+
+
+async def test_payment_flow_in_stored_language(primary_only, render_cache, monkeypatch):
+    from handlers import subscription
+    from keyboards.payments import FILL_UP_KEYBOARDS
+
+    await add_user(primary_only.async_session, tg_id=1, language="en")
+    callback = StubCallback("subscribe", language_code="ru")
+    await subscription.subscribe_menu(callback)
+    assert callback.message.edits == [(t("en", "fill_up_prompt"),
+                                       {"reply_markup": FILL_UP_KEYBOARDS["en"], "parse_mode": "HTML"})]
+
+    monkeypatch.setattr(subscription, "create_invoice", lambda amount: (None, None))
+    callback = StubCallback("pay_cryptobot", language_code="ru")
+    await subscription.pay_with_cryptobot(callback, StubState(selected_amount=199))
+    assert callback.answers == [t("en", "invoice_failed")]
+
+
+def test_captcha_buttons_are_translated():
+    from keyboards.main import generate_fruit_captcha
+
+    correct, keyboard = generate_fruit_captcha("en")
+    buttons = [row[0] for row in keyboard.inline_keyboard]
+    assert f"captcha_{correct}" in [button.callback_data for button in buttons]
+    assert all(button.text == t("en", button.callback_data.replace("captcha_", "fruit_")) for button in buttons)
+
+
+async def test_language_cache_evicts_least_recently_used(primary_only, monkeypatch):
+    monkeypatch.setattr(crud, "LANGUAGE_CACHE_SIZE", 2)
+    await add_user(primary_only.async_session, tg_id=1, language="en")
+    await add_user(primary_only.async_session, tg_id=2, language="en")
+    await add_user(primary_only.async_session, tg_id=3, language="en")
+
+    assert await crud.user_language(1) == "en"
+    assert await crud.user_language(2) == "en"
+    assert await crud.user_language(1) == "en"  # попадание освежает запись
+    assert await crud.user_language(3) == "en"
+    assert list(crud._languages) == [1, 3]
@@ -0,0 +1,112 @@
+import json
+import logging
+import queue
+import sys
+from types import SimpleNamespace
+
+from logging_setup import (ContextFilter, DeferredQueueHandler, ErrorRateLimitFilter, JsonFormatter,
+                           RouteSamplingFilter, route_of, route_var, update_id_var, user_id_var)
+
+
+def make_record(msg, level=logging.ERROR, name="test", args=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_error_rate_limit_counts_suppressed():
+    limiter = ErrorRateLimitFilter(burst=2, window=60)
+    assert [limiter.filter(make_record("boom")) for _ in range(4)] == [True, True, False, False]
+    assert limiter.filter(make_record("other"))
+
+    limiter._buckets[("test", "boom")] = (0, 2, 2)  # окно истекло
+    record = make_record("boom")
+    assert limiter.filter(record) and record.suppressed == 2
+
+
+def test_error_rate_limit_forgets_expired_and_caps_keys():
+    limiter = ErrorRateLimitFilter(burst=1, window=60, max_keys=10)
+
+    for i in range(25):
+        limiter.filter(make_record(f"user {i} failed"))
+    assert len(limiter._buckets) == 10
+    assert ("test", "user 24 failed") in limiter._buckets
+
+    # Окна всех ключей и последняя чистка — больше минуты назад
+    for key, (started, count, suppressed) in limiter._buckets.items():
+        limiter._buckets[key] = (started - 61, count, suppressed)
+    limiter._pruned_at -= 61
+    limiter.filter(make_record("fresh"))
+    assert list(limiter._buckets) == [("test", "fresh")]
+
+
+def test_context_fields_in_json():
+    tokens = (update_id_var.set(42), user_id_var.set(7), route_var.set("profile"))
+    try:
+        record = make_record("failed for %s", args=("user",))
+        assert ContextFilter().filter(record)
+    finally:
+        route_var.reset(tokens[2])
+        user_id_var.reset(tokens[1])
+        update_id_var.reset(tokens[0])
+    record.suppressed = 3
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        record.exc_info = sys.exc_info()
+
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["msg"] == "failed for user" and payload["level"] == "ERROR" and payload["logger"] == "test"
+    assert (payload["update_id"], payload["user_id"], payload["route"]) == (42, 7, "profile")
+    assert payload["suppressed"] == 3 and "ValueError: bad" in payload["exc"]
+    assert "dropped" not in payload and payload["ts"].endswith("+00:00")
+
+
+def test_route_sampling_keeps_warnings():
+    sampling = RouteSamplingFilter({"profile": 0})
+    info, warning, other = (make_record("x", level=logging.INFO), make_record("x", level=logging.WARNING),
+                            make_record("x", level=logging.INFO))
+    info.route = warning.route = "profile"
+    other.route = "referral"
+    assert not sampling.filter(info)
+    assert sampling.filter(warning) and sampling.filter(other)
+
+
+def test_queue_handler_formats_on_emitting_thread():
+    log_queue = queue.Queue()
+    handler = DeferredQueueHandler(log_queue)
+    items = ["a"]
+    handler.handle(make_record("items %s", level=logging.INFO, args=(items,)))
+    items.append("b")  # изменение после логирования не попадает в запись
+    record = log_queue.get_nowait()
+    assert record.msg == "items ['a']" and record.args is None
+
+
+def test_queue_handler_reports_dropped_records():
+    log_queue = queue.Queue(maxsize=1)
+    handler = DeferredQueueHandler(log_queue)
+    for i in range(3):
+        handler.handle(make_record(f"m{i}", level=logging.INFO))
+    assert handler.dropped == 2
+
+    log_queue.get_nowait()
+    handler.handle(make_record("after", level=logging.INFO))
+    record = log_queue.get_nowait()
+    assert record.dropped == 2
+    assert json.loads(JsonFormatter().format(record))["dropped"] == 2
+
+    handler.handle(make_record("next", level=logging.INFO))
+    assert not hasattr(log_queue.get_nowait(), "dropped")
+
+
+def test_route_of():
+    def callback(data):
+        return SimpleNamespace(callback_query=SimpleNamespace(data=data), message=None, event_type="callback_query")
+
+    def message(text):
+        return SimpleNamespace(callback_query=None, message=SimpleNamespace(text=text), event_type="message")
+
+    assert route_of(callback("captcha_apple")) == "captcha"
+    assert route_of(callback("check_123456")) == "check"
+    assert route_of(callback("fill_up_199")) == "fill_up"
+    assert route_of(callback("back_button")) == "back_button"
+    assert route_of(message("/start 12345")) == "start"
+    assert route_of(message("hello")) == "message"
@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from tests.conftest import StubCallback, StubMessage
+
+
+class FloodedMessage(StubMessage):
+    """Первые flood правок отвечают RetryAfter; before_retry вызывается перед каждым отказом"""
+
+    def __init__(self, chat_id: int, flood: int, before_retry=None):
+        super().__init__(chat_id)
+        self.flood = flood
+        self.before_retry = before_retry
+
+    async def edit_text(self, text, **kwargs):
+        if self.flood:
+            self.flood -= 1
+            if self.before_retry:
+                self.before_retry()
+            raise TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=0)
+        await super().edit_text(text, **kwargs)
+
+
+class TimedMessage(StubMessage):
+    def __init__(self, chat_id: int, message_id: int = 1):
+        super().__init__(chat_id, message_id)
+        self.times = []
+
+    async def edit_text(self, text, **kwargs):
+        self.times.append(time.monotonic())
+        await super().edit_text(text, **kwargs)
+
+
+class RejectingMessage(StubMessage):
+    def __init__(self, chat_id: int, error: str):
+        super().__init__(chat_id)
+        self.error = error
+        self.calls = 0
+
+    async def edit_text(self, text, **kwargs):
+        self.calls += 1
+        raise TelegramBadRequest(method=None, message=self.error)
+
+
+async def test_identical_render_only_answers(render_cache):
+    message = StubMessage(1)
+    assert await render_cache.render(StubCallback("x", message=message), "text")
+    callback = StubCallback("x", message=message)
+    assert not await render_cache.render(callback, "text")
+    assert message.edits == [("text", {})] and callback.answers == [None]
+
+    # Другой текст того же сообщения — снова правка
+    assert await render_cache.render(StubCallback("x", message=message), "other")
+    assert len(message.edits) == 2
+
+
+async def test_renders_of_one_message_are_coalesced(render_cache, monkeypatch):
+    monkeypatch.setattr(render_cache, "MIN_EDIT_INTERVAL", 0.05)
+    render_cache._last_edit[1] = time.monotonic()  # все три ждут слот чата
+    message = StubMessage(1)
+    callbacks = [StubCallback("x", message=message) for _ in range(3)]
+
+    results = await asyncio.gather(*(render_cache.render(cb, text) for cb, text in zip(callbacks, "abc")))
+    assert results == [False, False, True]
+    assert message.edits == [("c", {})]
+    assert [cb.answers for cb in callbacks] == [[None], [None], []]
+
+
+async def test_edits_in_one_chat_are_spaced(render_cache, monkeypatch):
+    monkeypatch.setattr(render_cache, "MIN_EDIT_INTERVAL", 0.05)
+    first, second, other_chat = TimedMessage(1, 1), TimedMessage(1, 2), TimedMessage(2, 1)
+
+    await asyncio.gather(*(render_cache.render(StubCallback("x", message=m), "text")
+                           for m in (first, second, other_chat)))
+    assert second.times[0] - first.times[0] >= 0.05 * 0.9
+    assert abs(other_chat.times[0] - first.times[0]) < 0.05
+
+
+async def test_retry_after_is_retried(render_cache):
+    message = FloodedMessage(1, flood=render_cache.RETRY_ATTEMPTS - 1)
+    assert await render_cache.render(StubCallback("x", message=message), "text")
+    assert message.edits == [("text", {})]
+
+
+async def test_retry_after_reraised_after_last_attempt(render_cache):
+    message = FloodedMessage(1, flood=render_cache.RETRY_ATTEMPTS)
+    with pytest.raises(TelegramRetryAfter):
+        await render_cache.render(StubCallback("x", message=message), "text")
+    assert not message.edits and not render_cache._pending
+
+
+async def test_message_not_modified_is_remembered(render_cache):
+    message = RejectingMessage(1, "Bad Request: message is not modified: specified new message content "
+                                  "and reply markup are exactly the same")
+    callback = StubCallback("x", message=message)
+    assert not await render_cache.render(callback, "text")
+    assert callback.answers == [None]
+
+    assert not await render_cache.render(StubCallback("x", message=message), "text")
+    assert message.calls == 1
+
+
+async def test_other_bad_request_is_raised(render_cache):
+    message = RejectingMessage(1, "Bad Request: message to edit not found")
+    with pytest.raises(TelegramBadRequest):
+        await render_cache.render(StubCallback("x", message=message), "text")
+    assert not render_cache._rendered
+
+
+async def test_retry_dropped_when_newer_render_arrives(render_cache):
+    message = FloodedMessage(1, flood=1)
+    newer = []
+    message.before_retry = lambda: newer.append(
+        asyncio.ensure_future(render_cache.render(StubCallback("x", message=message), "new")))
+
+    old = StubCallback("x", message=message)
+    assert not await render_cache.render(old, "old")
+    assert await newer[0]
+    assert message.edits == [("new", {})]
+    assert old.answers == [None]
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import query_budget
+from database import crud
+from handlers import admin, profile, referral, start, subscription, support, vpn_settings
+from query_budget import QueryBudgetExceeded, ROUTE_BUDGETS, track_queries
+from tests.conftest import StubBot, StubCallback, StubMessage, StubState, add_user
+
+# Бюджеты проверяются на холодном кэше языков: худший случай первого апдейта после рестарта
+
+
+def stub_message(user_id: int, username: str = None) -> StubMessage:
+    message = StubMessage(user_id)
+    message.from_user = SimpleNamespace(id=user_id, username=username, language_code="ru", is_bot=False)
+    return message
+
+
+@pytest.fixture
+async def registered(primary_only, render_cache):
+    return await add_user(primary_only.async_session, tg_id=1, username="user",
+                          premium_until=datetime.utcnow() + timedelta(days=3), is_premium=True)
+
+
+@pytest.mark.parametrize("route, handler", [
+    ("back_button", start.back_button),
+    ("settings", vpn_settings.settings_handler),
+    ("Phone", vpn_settings.phone_handler),
+    ("PC", vpn_settings.pc_handler),
+    ("support", support.support_handler),
+    ("license", support.license_handler),
+])
+async def test_navigation_within_budget(registered, route, handler):
+    callback = StubCallback(route)
+    async with track_queries(route, strict=True) as stats:
+        await handler(callback)
+    assert callback.message.edits
+    assert stats.statements == ROUTE_BUDGETS[route]
+
+    # Язык уже в кэше: навигация больше не ходит в БД
+    async with track_queries(route, strict=True) as stats:
+        await handler(StubCallback(route, message=StubMessage(1, message_id=2)))
+    assert stats.statements == 0
+
+
+async def test_back_to_menu_within_budget(registered):
+    state = StubState(selected_amount=199)
+    async with track_queries("back", strict=True):
+        await subscription.back_to_menu(StubCallback("back"), state)
+    assert state.data == {}
+
+
+async def test_subscribe_within_budget(registered):
+    async with track_queries("subscribe", strict=True) as stats:
+        await subscription.subscribe_menu(StubCallback("subscribe"))
+    assert stats.statements == ROUTE_BUDGETS["subscribe"]
+
+    async with track_queries("fill_up", strict=True) as stats:
+        await subscription.process_fill_up(StubCallback("fill_up_199", message=StubMessage(1, message_id=2)),
+                                           StubState())
+    assert stats.statements == 0
+
+
+@pytest.mark.parametrize("user_id", [1, 2])
+async def test_start_within_budget(registered, user_id):
+    message = stub_message(user_id)
+    async with track_queries("start", strict=True) as stats:
+        await start.start_handler(message, SimpleNamespace(args="1"))
+    assert len(message.answers) == 1
+    assert stats.statements == 1  # промах get_user_by_tg кэширует и язык
+    start.captcha_answers.clear()
+
+
+async def test_captcha_within_budget(registered):
+    start.captcha_answers[2] = {"correct": "apple", "ref_code": 1}
+    bot = StubBot()
+    async with track_queries("captcha", strict=True):
+        await start.captcha_callback(StubCallback("captcha_apple", user_id=2, bot=bot))
+    assert await crud.get_user_by_tg(2) is not None
+    assert [chat_id for chat_id, _ in bot.sent] == [1]
+
+
+@pytest.mark.parametrize("user_id", [1, 2])
+async def test_profile_within_budget(registered, user_id):
+    callback = StubCallback("profile", user_id=user_id)
+    async with track_queries("profile", strict=True):
+        await profile.profile_handler(callback)
+    assert callback.message.edits
+
+
+@pytest.mark.parametrize("user_id", [1, 2])
+async def test_referral_within_budget(registered, user_id):
+    callback = StubCallback("referral", user_id=user_id)
+    async with track_queries("referral", strict=True) as stats:
+        await referral.referral_handler(callback)
+    assert callback.message.edits
+    assert stats.statements == 1
+
+
+async def test_pay_cryptobot_within_budget(registered, monkeypatch):
+    monkeypatch.setattr(subscription, "create_invoice", lambda amount: ("https://t.me/pay", 42))
+    state = StubState(selected_amount=199)
+    async with track_queries("pay_cryptobot", strict=True):
+        await subscription.pay_with_cryptobot(StubCallback("pay_cryptobot"), state)
+    assert state.data["invoice_id"] == 42
+
+
+async def test_check_payment_within_budget(registered, monkeypatch, tmp_path):
+    paid = {"ok": True, "result": {"items": [{"invoice_id": 42, "status": "paid", "amount": "2.5"}]}}
+    monkeypatch.setattr(subscription, "check_invoice_status", lambda invoice_id: paid)
+    monkeypatch.chdir(tmp_path)  # qw.docx нет: ветка с message.answer
+    callback = StubCallback("check_42")
+    async with track_queries("check", strict=True):
+        await subscription.check_payment(callback, StubState(selected_amount=199))
+
+    user = await crud.get_user_by_tg(1)
+    assert user.balance == 199 and user.premium_until > datetime.utcnow() + timedelta(days=9)
+    assert callback.message.edits and callback.message.answers
+
+
+async def test_admin_stats_within_budget(registered):
+    callback = StubCallback("admin_stats", username=admin.ADMINS[0])
+    async with track_queries("admin_stats", strict=True):
+        await admin.admin_stats(callback)
+    assert "Статистика FaceVPN" in callback.message.edits[0][0]
+
+
+async def test_over_budget_fails(registered, monkeypatch):
+    monkeypatch.setitem(query_budget.ROUTE_BUDGETS, "profile", 1)
+    with pytest.raises(QueryBudgetExceeded):
+        async with track_queries("profile", strict=True):
+            await profile.profile_handler(StubCallback("profile"))
+
+
+
+async def test_sql_comment_carries_only_route(primary_only):
+    from sqlalchemy import event
+
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # update_id в тексте запроса сделал бы каждый запрос уникальным для кэша выражений
+    sync_engine = primary_only.engine.sync_engine
+    event.listen(sync_engine, "after_cursor_execute", capture)
+    try:
+        with pytest.raises(QueryBudgetExceeded, match="Update 987654"):
+            async with track_queries("subscribe", update_id=987654, strict=True):
+                await crud.get_user_by_tg(1)
+                await crud.get_user_by_tg(2)
+    finally:
+        event.remove(sync_engine, "after_cursor_execute", capture)
+    assert len(statements) == 2 and all(s.endswith(" /* route=subscribe */") for s in statements)
@@ -0,0 +1,124 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from database import crud
+from database.models import User
+from database.stats import get_dashboard
+from query_budget import track_queries
+from tests.conftest import StubBot, StubCallback
+
+
+async def get_user(db, tg_id):
+    async with db.async_session() as s:
+        return (await s.execute(select(User).where(User.tg_id == tg_id))).scalar_one_or_none()
+
+
+async def raw_premium_until(db, tg_id):
+    async with db.engine.connect() as conn:
+        return (await conn.execute(text('SELECT premium_until FROM "user" WHERE tg_id = :id'), {"id": tg_id})).scalar()
+
+
+def executed(stats, prefix):
+    """Сколько раз выполнялись запросы, начинающиеся с prefix"""
+    return sum(count for (statement, _), count in stats.queries.items() if statement.lstrip().startswith(prefix))
+
+
+async def test_create_user_credits_referrer(primary_only):
+    await crud.create_user(501, "ref")
+    user, credited = await crud.create_user(502, "new", ref_code=501)
+    referrer = await get_user(primary_only, 501)
+    # referrer_id — user.id реферера, а не его tg_id
+    assert credited and user.tg_id == 502 and user.referrer_id == referrer.id != 501
+    assert referrer.referrals_count == 1 and referrer.is_premium
+    assert referrer.premium_until > datetime.utcnow() + timedelta(days=6)
+
+
+async def test_create_user_unknown_referrer(primary_only):
+    user, credited = await crud.create_user(502, "new", ref_code=999)
+    assert user.referrer_id is None and not credited
+    totals, _, today, _ = await get_dashboard()
+    assert totals.total_users == 1 and totals.referred_users == 0
+    assert today.registrations == 1 and today.referred_registrations == 0
+
+
+async def test_create_user_existing_returns_user_without_credit(primary_only):
+    await crud.create_user(501, "ref")
+    await crud.create_user(502, "new", ref_code=501)
+    user, credited = await crud.create_user(502, "new", ref_code=501)
+    assert user.tg_id == 502 and not credited
+    assert (await get_user(primary_only, 501)).referrals_count == 1
+
+
+async def test_concurrent_registration_credits_once(primary_only):
+    await crud.create_user(501, "ref")
+    results = await asyncio.gather(*(crud.create_user(502, "new", ref_code=501) for _ in range(2)))
+    assert sorted(credited for _, credited in results) == [False, True]
+    assert (await get_user(primary_only, 501)).referrals_count == 1
+    totals, _, _, _ = await get_dashboard()
+    assert totals.total_users == 2 and totals.referred_users == 1
+
+
+async def test_referral_bonus_keeps_sqlite_datetime_format(primary_only):
+    await crud.create_user(501, "ref")
+    await crud.create_user(502, ref_code=501)
+    first = await raw_premium_until(primary_only, 501)
+    await crud.create_user(503, ref_code=501)
+    second = await raw_premium_until(primary_only, 501)
+
+    pattern = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6}$")
+    assert pattern.match(first) and pattern.match(second)
+    assert first[-6:] == second[-6:]
+    referrer = await get_user(primary_only, 501)
+    assert referrer.premium_until == datetime.strptime(first, "%Y-%m-%d %H:%M:%S.%f") + timedelta(days=7)
+
+
+async def test_bulk_registration(primary_only, monkeypatch):
+    monkeypatch.setattr(crud, "BULK_CHUNK_SIZE", 3)
+    await crud.create_user(501, "ref_a")
+    await crud.create_user(502, "ref_b")
+    await crud.create_user(510, "existing")
+
+    users = [{"tg_id": tg_id, "username": f"u{tg_id}", "ref_code": 501} for tg_id in range(510, 517)]
+    users += [{"tg_id": 511, "username": "dup", "ref_code": 501}]
+    users += [{"tg_id": 520, "ref_code": 502}, {"tg_id": 521, "ref_code": 521}, {"tg_id": 522, "ref_code": 999}]
+
+    async with track_queries("bulk", strict=False) as stats:
+        created = await crud.create_users_bulk(users)
+
+    # 510 уже был, 511 повторяется во входе: новые 511..516, 520..522
+    assert created == 9
+    assert executed(stats, "INSERT INTO user ") == 4  # 10 уникальных строк пачками по 3
+    assert executed(stats, "UPDATE user ") == 2  # по одному UPDATE на реферера
+
+    ref_a = await get_user(primary_only, 501)
+    assert ref_a.referrals_count == 6
+    assert ref_a.premium_until > datetime.utcnow() + timedelta(days=7 * 6 - 1)
+    assert (await get_user(primary_only, 502)).referrals_count == 1
+    assert (await get_user(primary_only, 512)).referrer_id == ref_a.id
+    assert (await get_user(primary_only, 521)).referrer_id is None
+    assert (await get_user(primary_only, 522)).referrer_id is None
+    assert (await get_user(primary_only, 511)).username == "dup"
+
+    totals, active_premium, today, _ = await get_dashboard()
+    assert active_premium == 2  # оба реферера получили бонусные дни
+    assert totals.total_users == 12 and totals.referred_users == 7
+    assert today.registrations == 12 and today.referred_registrations == 7
+
+
+async def test_concurrent_captcha_answers_register_once(primary_only, render_cache):
+    from handlers import start
+
+    await crud.create_user(501, "ref")
+    start.captcha_answers[502] = {"correct": "apple", "ref_code": 501}
+    bot = StubBot()
+    callbacks = [StubCallback("captcha_apple", user_id=502, bot=bot) for _ in range(2)]
+
+    await asyncio.gather(*(start.captcha_callback(cb) for cb in callbacks))
+
+    assert 502 not in start.captcha_answers
+    assert sum(len(cb.message.edits) for cb in callbacks) == 1
+    assert (await get_user(primary_only, 501)).referrals_count == 1
+    assert len(bot.sent) == 1
@@ -0,0 +1,128 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import crud
+from tests.conftest import add_user
+
+
+async def seed(db, tg_id=1):
+    """Один и тот же пользователь с разным username в каждой базе — видно, откуда пришло чтение"""
+    await add_user(db.async_session, tg_id=tg_id, username="primary")
+    for i, replica in enumerate(db.replica_sessions):
+        await add_user(replica, tg_id=tg_id, username=f"replica{i}")
+
+
+async def test_reads_round_robin_over_replicas(db):
+    await seed(db)
+    names = [(await crud.get_user_by_tg(1)).username for _ in range(4)]
+    assert "primary" not in names
+    assert sorted(set(names)) == ["replica0", "replica1"]
+    assert names[0] != names[1] and names[0] == names[2]
+
+
+async def test_no_healthy_replicas_reads_primary(primary_only):
+    await seed(primary_only)
+    assert (await crud.get_user_by_tg(1)).username == "primary"
+
+
+async def test_mark_written_sticks_to_primary(db, monkeypatch):
+    monkeypatch.setattr(db, "STICKY_SECONDS", 0.2)
+    await seed(db, 1)
+    await seed(db, 2)
+
+    db.mark_written(1)
+    assert (await crud.get_user_by_tg(1)).username == "primary"
+    assert (await crud.get_user_by_tg(1)).username == "primary"
+    # Прилипание только для записавшего пользователя
+    assert (await crud.get_user_by_tg(2)).username.startswith("replica")
+
+    await asyncio.sleep(0.25)
+    assert (await crud.get_user_by_tg(1)).username.startswith("replica")
+
+
+async def test_replica_error_falls_back_to_primary(db, monkeypatch):
+    await seed(db)
+    db._healthy.discard(1)
+    async with db.replica_engines[0].begin() as conn:
+        await conn.execute(text('DROP TABLE "user"'))
+
+    calls = []
+    original = crud.mark_unhealthy
+    monkeypatch.setattr(crud, "mark_unhealthy", lambda maker: (calls.append(maker), original(maker)))
+
+    assert (await crud.get_user_by_tg(1)).username == "primary"
+    assert calls == [db.replica_sessions[0]]
+    assert 0 not in db._healthy
+    # Без здоровых реплик дальше читаем с primary, без повторной ошибки
+    assert (await crud.get_user_by_tg(1)).username == "primary"
+
+
+async def test_check_replicas_removes_and_restores(db, monkeypatch, tmp_path):
+    healthy_engine = db.replica_engines[0]
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/dir/replica.db")
+    monkeypatch.setattr(db, "replica_engines", [broken, db.replica_engines[1]])
+    await db.check_replicas()
+    assert db._healthy == {1}
+    await broken.dispose()
+
+    db.replica_engines[0] = healthy_engine
+    await db.check_replicas()
+    assert db._healthy == {0, 1}
+
+
+async def test_check_replicas_times_out_hanging_replica(db, monkeypatch):
+    async def hang(replica):
+        if replica is db.replica_engines[0]:
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(db, "_ping", hang)
+    monkeypatch.setattr(db, "HEALTH_CHECK_TIMEOUT", 0.05)
+    await asyncio.wait_for(db.check_replicas(), 1)
+    assert db._healthy == {1}
+
+
+async def test_check_replicas_prunes_expired_stickiness(db, monkeypatch):
+    monkeypatch.setattr(db, "STICKY_SECONDS", 0)
+    db.mark_written(1, 2)
+    await db.check_replicas()
+    assert db._recent_writes == {}
+
+
+class FailingSessionMaker:
+    """sessionmaker реплики, которая зависает или отказывает в соединении"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        if self.error:
+            raise self.error
+        await asyncio.sleep(10)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def test_hanging_replica_read_times_out_to_primary(db, monkeypatch):
+    await seed(db)
+    monkeypatch.setattr(crud, "REPLICA_READ_TIMEOUT", 0.05)
+    monkeypatch.setattr(db, "replica_sessions", [FailingSessionMaker(), db.replica_sessions[1]])
+    db._healthy.discard(1)
+
+    user = await asyncio.wait_for(crud.get_user_by_tg(1), 1)
+    assert user.username == "primary"
+    assert 0 not in db._healthy
+
+
+async def test_refused_replica_connection_falls_back_to_primary(db, monkeypatch):
+    await seed(db)
+    monkeypatch.setattr(db, "replica_sessions", [FailingSessionMaker(ConnectionRefusedError()), db.replica_sessions[1]])
+    db._healthy.discard(1)
+
+    assert (await crud.get_user_by_tg(1)).username == "primary"
+    assert 0 not in db._healthy
@@ -0,0 +1,139 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from database import crud, stats
+from database.models import DailyStat, StatTotals
+from database.stats import get_dashboard, reconcile_stats
+from tests.conftest import StubCallback, add_user
+
+
+async def shard_values(db, column):
+    async with db.async_session() as s:
+        return (await s.execute(select(column))).scalars().all()
+
+
+async def corrupt(db, stmt):
+    async with db.async_session() as s:
+        await s.execute(stmt)
+        await s.commit()
+
+
+async def register(count: int, referrer: int = None):
+    for tg_id in range(600, 600 + count):
+        await crud.create_user(tg_id, ref_code=referrer)
+
+
+async def test_bumps_spread_over_shards(primary_only):
+    await crud.create_user(500, "ref")
+    await register(40, referrer=500)
+
+    totals = [value for value in await shard_values(primary_only, StatTotals.total_users) if value]
+    daily = [value for value in await shard_values(primary_only, DailyStat.registrations) if value]
+    assert sum(totals) == sum(daily) == 41
+    assert len(totals) > 1 and len(daily) > 1
+
+    total, active_premium, today, _ = await get_dashboard()
+    assert total.total_users == 41 and total.referred_users == 40
+    assert active_premium == 1
+    assert today.registrations == 41 and today.referred_registrations == 40
+
+
+async def test_reconcile_fixes_corrupted_shards(primary_only, caplog):
+    today = datetime.utcnow().date()
+    yesterday = today - timedelta(days=1)
+    await crud.create_user(500, "ref")
+    await register(5, referrer=500)
+    # Пользователь за вчера, о котором счетчики не знают
+    await add_user(primary_only.async_session, tg_id=700, created_at=datetime.utcnow() - timedelta(days=1))
+
+    await corrupt(primary_only, update(StatTotals).where(StatTotals.id == 3)
+                  .values(total_users=StatTotals.total_users + 5, referred_users=0))
+    await corrupt(primary_only, update(DailyStat).where(DailyStat.day == today)
+                  .values(registrations=DailyStat.registrations + 2, referred_registrations=0))
+    async with primary_only.async_session() as s:
+        s.add(DailyStat(day=today - timedelta(days=2), shard=1, registrations=9, referred_registrations=9))
+        await s.commit()
+
+    with caplog.at_level(logging.WARNING, logger="database.stats"):
+        await reconcile_stats()
+    assert any("Stats drift" in record.message for record in caplog.records)
+
+    totals, _, today_stat, yesterday_stat = await get_dashboard()
+    assert totals.total_users == 7 and totals.referred_users == 5
+    assert totals.checked_at is not None
+    assert (today_stat.registrations, today_stat.referred_registrations) == (6, 5)
+    assert (yesterday_stat.registrations, yesterday_stat.referred_registrations) == (1, 0)
+    async with primary_only.async_session() as s:
+        stale = (await s.execute(select(DailyStat).where(DailyStat.day == today - timedelta(days=2)))).scalars().all()
+    assert sum(row.registrations for row in stale) == 0
+    assert sum(row.referred_registrations for row in stale) == 0
+
+    # Исправленные счетчики больше не расходятся
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="database.stats"):
+        await reconcile_stats()
+    assert not caplog.records
+
+
+async def test_reconcile_keeps_registrations_committed_after_snapshot(primary_only, monkeypatch):
+    await register(3)
+    await corrupt(primary_only, update(StatTotals).where(StatTotals.id == 1).values(total_users=100))
+
+    real_session = stats.async_session
+    sessions = []
+
+    class RegisterBeforeWrite:
+        """Вторая сессия сверки — запись поправок; перед ней успевает закоммититься регистрация"""
+
+        def __init__(self):
+            self.session = real_session()
+
+        async def __aenter__(self):
+            sessions.append(self)
+            if len(sessions) == 2:
+                await crud.create_user(900)
+            return await self.session.__aenter__()
+
+        async def __aexit__(self, *exc):
+            return await self.session.__aexit__(*exc)
+
+    monkeypatch.setattr(stats, "async_session", RegisterBeforeWrite)
+    await reconcile_stats()
+    monkeypatch.undo()
+
+    totals, _, today, _ = await get_dashboard()
+    assert totals.total_users == 4 and today.registrations == 4
+
+
+async def test_expired_premium_is_not_active(primary_only):
+    now = datetime.utcnow()
+    await add_user(primary_only.async_session, tg_id=501, is_premium=True, premium_until=now + timedelta(days=1))
+    await add_user(primary_only.async_session, tg_id=502, is_premium=True, premium_until=now - timedelta(seconds=1))
+    await add_user(primary_only.async_session, tg_id=503)
+    _, active_premium, _, _ = await get_dashboard()
+    assert active_premium == 1
+
+
+async def test_admin_stats_text(primary_only, render_cache):
+    from handlers import admin
+
+    await crud.create_user(500, "ref")
+    await register(2, referrer=500)
+    await crud.credit_payment(600, 199.0, 7)
+    await reconcile_stats()
+
+    callback = StubCallback("admin_stats", username=admin.ADMINS[0])
+    await admin.admin_stats(callback)
+    text = callback.message.edits[0][0]
+    assert "Всего пользователей: 3" in text
+    assert "Активный премиум: 2" in text
+    assert "Выручка: 199.00₽" in text
+    assert "Пришли по рефералке: 2 (66.7%)" in text
+    assert "Сегодня: 3 регистраций (2 по рефералке), 1 покупок премиума, 199.00₽" in text
+    assert "primary: " in text and "replica0: " in text
+
+    callback = StubCallback("admin_stats", username="someone")
+    await admin.admin_stats(callback)
+    assert not callback.message.edits and callback.answers
@@ -0,0 +1,188 @@
+import asyncio
+import calendar
+import contextlib
+import json
+import os
+import socket
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+import traffic_ingest
+from database import crud
+from database.models import TrafficDaily, TrafficUsage
+from traffic_ingest import UsageAggregator
+
+
+def sample(rx, tx, peer="p1", user=1, node="n1", ts=None) -> bytes:
+    return json.dumps({"node": node, "peer": peer, "user": user, "rx": rx, "tx": tx, "ts": ts}).encode()
+
+
+def timestamp(hour: int) -> float:
+    """UTC-время сегодняшнего часа hour"""
+    return calendar.timegm(datetime.utcnow().replace(hour=hour, minute=5).utctimetuple())
+
+
+async def wait_for_samples(aggregator: UsageAggregator, count: int):
+    async def poll():
+        while aggregator.samples < count:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), 5)
+
+
+async def stop(task: asyncio.Task):
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def test_aggregator_deltas_and_reset():
+    aggregator = UsageAggregator()
+    ts = timestamp(1)
+    aggregator.add_line(sample(100, 10, ts=ts))  # первый сэмпл — только база
+    assert aggregator.pending == 0
+
+    aggregator.add_line(sample(150, 30, ts=ts))
+    aggregator.add_line(sample(40, 5, ts=ts))    # счетчик упал: нода перезапустилась
+    aggregator.add_line(sample(0, 0, peer="p2", user=2, ts=ts))
+    aggregator.add_line(sample(7, 0, peer="p2", user=2, ts=timestamp(2)))
+    aggregator.add_line(b"not json")
+    aggregator.add_line(json.dumps({"node": "n1", "rx": 1}))
+
+    bucket = datetime.utcfromtimestamp(ts).replace(minute=0, second=0)
+    assert aggregator.samples == 5 and aggregator.rejected == 2
+    pending = aggregator.take()
+    assert pending[1, bucket] == [50 + 40, 20 + 5]
+    assert pending[2, bucket.replace(hour=2)] == [7, 0]
+    assert aggregator.pending == 0
+
+    aggregator.add_line(sample(45, 5, ts=ts))
+    aggregator.restore(pending)
+    assert aggregator.take()[1, bucket] == [95, 25]
+
+
+async def test_flush_upserts_hourly_and_daily(primary_only):
+    aggregator = UsageAggregator()
+    for hour in (1, 2):
+        aggregator.add("n1", "p1", 1, 0, 0, timestamp(hour))
+        aggregator.add("n1", "p1", 1, 1000, 24, timestamp(hour))
+        aggregator.add("n1", "p1", 1, 0, 0, timestamp(hour))  # рестарт, следующий круг с нуля
+    assert await traffic_ingest.flush(aggregator) == 2
+
+    aggregator.add("n1", "p1", 1, 500, 0, timestamp(2))
+    assert await traffic_ingest.flush(aggregator) == 1
+    assert await traffic_ingest.flush(aggregator) == 0
+
+    async with primary_only.async_session() as s:
+        hourly = (await s.execute(select(TrafficUsage).order_by(TrafficUsage.bucket))).scalars().all()
+        daily = (await s.execute(select(TrafficDaily))).scalars().all()
+    assert [(row.rx, row.tx) for row in hourly] == [(1000, 24), (1500, 24)]
+    assert [(row.day, row.rx, row.tx) for row in daily] == [(datetime.utcnow().date(), 2500, 48)]
+    assert await crud.get_traffic_usage(1) == (2548, 2548)
+    assert await crud.get_traffic_usage(2) == (0, 0)
+
+
+async def test_flush_failure_restores_pending(primary_only, monkeypatch):
+    aggregator = UsageAggregator()
+    aggregator.add("n1", "p1", 1, 0, 0, timestamp(1))
+    aggregator.add("n1", "p1", 1, 100, 0, timestamp(1))
+
+    def broken_upsert(*args):
+        raise RuntimeError("db is down")
+    monkeypatch.setattr(traffic_ingest, "_upsert", broken_upsert)
+    with pytest.raises(RuntimeError):
+        await traffic_ingest.flush(aggregator)
+    assert aggregator.pending == 1
+
+    monkeypatch.undo()
+    aggregator.add("n1", "p1", 1, 150, 0, timestamp(1))
+    assert await traffic_ingest.flush(aggregator) == 1
+    assert await crud.get_traffic_usage(1) == (150, 150)
+
+
+def test_restore_drops_oldest_buckets_over_limit(monkeypatch):
+    monkeypatch.setattr(traffic_ingest, "MAX_BUFFERED", 2)
+    aggregator = UsageAggregator()
+    for hour in (1, 2, 3):
+        aggregator.add("n1", f"p{hour}", hour, 0, 0, timestamp(hour))
+        aggregator.add("n1", f"p{hour}", hour, 10, 0, timestamp(hour))
+    aggregator.restore(aggregator.take())
+
+    assert aggregator.dropped == 1
+    assert sorted(tg_id for tg_id, _ in aggregator.take()) == [2, 3]
+
+
+async def test_cancelled_flush_loop_writes_buffer(primary_only, monkeypatch):
+    monkeypatch.setattr(traffic_ingest, "FLUSH_INTERVAL", 60)
+    aggregator = UsageAggregator()
+    task = asyncio.create_task(traffic_ingest.flush_loop(aggregator, asyncio.Event()))
+    await asyncio.sleep(0.05)  # цикл ждет таймера, до отмены сброса не будет
+
+    aggregator.add("n1", "p1", 1, 0, 0, timestamp(1))
+    aggregator.add("n1", "p1", 1, 100, 0, timestamp(1))
+    await stop(task)
+
+    assert aggregator.pending == 0
+    assert await crud.get_traffic_usage(1) == (100, 100)
+
+
+async def test_tail_file_survives_rotation_and_truncation(tmp_path, monkeypatch):
+    monkeypatch.setattr(traffic_ingest, "TAIL_POLL_INTERVAL", 0.01)
+    path = tmp_path / "usage.log"
+    path.write_bytes(sample(1, 1) + b"\n")  # уже записанное до старта пропускается
+    aggregator = UsageAggregator()
+    task = asyncio.create_task(traffic_ingest.tail_file(str(path), aggregator, asyncio.Event()))
+    try:
+        await asyncio.sleep(0.05)
+        with open(path, "ab") as f:
+            f.write(sample(10, 0) + b"\n" + sample(20, 0))
+        await wait_for_samples(aggregator, 1)
+        with open(path, "ab") as f:
+            f.write(b"\n")  # дописанный хвост строки
+        await wait_for_samples(aggregator, 2)
+
+        os.rename(path, tmp_path / "usage.log.1")
+        path.write_bytes(sample(30, 0) + b"\n")
+        await wait_for_samples(aggregator, 3)
+
+        path.write_bytes(b"")  # новая строка той же длины: усечение должно быть замечено до нее
+        await asyncio.sleep(0.1)
+        path.write_bytes(sample(35, 0) + b"\n")
+        await wait_for_samples(aggregator, 4)
+    finally:
+        await stop(task)
+
+    assert aggregator.rejected == 0
+    assert sum(rx for rx, _ in aggregator.take().values()) == 25
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def test_serve_socket_skips_oversized_lines():
+    port = free_port()
+    aggregator = UsageAggregator()
+    task = asyncio.create_task(traffic_ingest.serve_socket(f"127.0.0.1:{port}", aggregator, asyncio.Event()))
+    try:
+        for _ in range(100):
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                break
+            except ConnectionError:
+                await asyncio.sleep(0.01)
+        writer.write(sample(0, 0) + b"\n" + b"x" * (1 << 17) + b"\n" + sample(64, 0) + b"\n")
+        await writer.drain()
+        await wait_for_samples(aggregator, 2)
+        writer.write(sample(96, 0) + b"\n")
+        await writer.drain()
+        await wait_for_samples(aggregator, 3)
+        writer.close()
+    finally:
+        await stop(task)
+
+    assert aggregator.rejected >= 1
+    assert sum(rx for rx, _ in aggregator.take().values()) == 96
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from database.models import TrafficUsage, TrafficDaily
+from database.session import async_session, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Источники счетчиков: файл, который дописывают ноды, и/или TCP host:port.
+# Приемник без аутентификации: слушать только loopback или внутренний адрес сети нод
+TRAFFIC_FILE = os.getenv("TRAFFIC_FILE")
+TRAFFIC_LISTEN = os.getenv("TRAFFIC_LISTEN")
+
+FLUSH_INTERVAL = 30
+MAX_PENDING = 50_000   # при таком числе (пользователь, час) в буфере сброс не ждет таймера
+MAX_BUFFERED = 500_000  # потолок буфера, пока БД недоступна: сверх него выбрасываются самые старые часы
+SHUTDOWN_FLUSH_TIMEOUT = 10
+FLUSH_BATCH = 1000
+RETENTION_DAYS = 35    # часовые корзины старше удаляются, суточный rollup остается
+PRUNE_INTERVAL = 60 * 60
+TAIL_POLL_INTERVAL = 1
+
+
+class UsageAggregator:
+    """Превращает накопительные счетчики пиров в дельты по пользователям и часам.
+
+    Сэмпл — JSON-строка {"node", "peer", "user", "rx", "tx", "ts"?}, где rx/tx —
+    счетчики байт с момента поднятия интерфейса (как в `wg show dump`), user — tg_id.
+    Первый сэмпл пира только запоминается; падение счетчика считается рестартом ноды.
+    """
+
+    def __init__(self):
+        self._last = {}     # (node, peer) -> (rx, tx)
+        self._pending = {}  # (tg_id, bucket) -> [rx, tx]
+        self.samples = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add_line(self, line: str | bytes):
+        try:
+            sample = json.loads(line)
+            self.add(sample["node"], sample["peer"], int(sample["user"]),
+                     int(sample["rx"]), int(sample["tx"]), sample.get("ts"))
+        except (ValueError, KeyError, TypeError):
+            self.rejected += 1
+
+    def add(self, node: str, peer: str, tg_id: int, rx: int, tx: int, ts: float = None):
+        self.samples += 1
+        key = (node, peer)
+        last = self._last.get(key)
+        self._last[key] = (rx, tx)
+        if last is None:
+            return
+        delta_rx = rx - last[0] if rx >= last[0] else rx
+        delta_tx = tx - last[1] if tx >= last[1] else tx
+        if not delta_rx and not delta_tx:
+            return
+
+        moment = datetime.utcfromtimestamp(ts) if ts else datetime.utcnow()
+        bucket = moment.replace(minute=0, second=0, microsecond=0)
+        totals = self._pending.get((tg_id, bucket))
+        if totals is None:
+            self._pending[tg_id, bucket] = [delta_rx, delta_tx]
+        else:
+            totals[0] += delta_rx
+            totals[1] += delta_tx
+
+    def take(self) -> dict:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending: dict):
+        """Возвращает в буфер данные неудавшегося сброса, не выходя за MAX_BUFFERED"""
+        for key, (rx, tx) in pending.items():
+            totals = self._pending.setdefault(key, [0, 0])
+            totals[0] += rx
+            totals[1] += tx
+
+        excess = len(self._pending) - MAX_BUFFERED
+        if excess > 0:
+            for key in heapq.nsmallest(excess, self._pending, key=lambda key: key[1]):
+                del self._pending[key]
+            self.dropped += excess
+            logger.warning("Usage buffer is full, dropped %s oldest rows (%s in total)", excess, self.dropped)
+
+
+def _upsert(session, model, index_elements):
+    table = model.__table__
+    stmt = dialect_insert(session, table)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={"rx": table.c.rx + stmt.excluded.rx, "tx": table.c.tx + stmt.excluded.tx}
+    )
+
+
+async def flush(aggregator: UsageAggregator) -> int:
+    """Пишет накопленные дельты пачками в traffic_usage и traffic_daily одной транзакцией"""
+    pending = aggregator.take()
+    if not pending:
+        return 0
+
+    hourly = [{"tg_id": tg_id, "bucket": bucket, "rx": rx, "tx": tx}
+              for (tg_id, bucket), (rx, tx) in pending.items()]
+    daily = {}
+    for (tg_id, bucket), (rx, tx) in pending.items():
+        totals = daily.setdefault((tg_id, bucket.date()), [0, 0])
+        totals[0] += rx
+        totals[1] += tx
+    daily = [{"tg_id": tg_id, "day": day, "rx": rx, "tx": tx} for (tg_id, day), (rx, tx) in daily.items()]
+
+    try:
+        async with async_session() as session:
+            hourly_stmt = _upsert(session, TrafficUsage, ["tg_id", "bucket"])
+            daily_stmt = _upsert(session, TrafficDaily, ["tg_id", "day"])
+            for i in range(0, len(hourly), FLUSH_BATCH):
+                await session.execute(hourly_stmt, hourly[i:i + FLUSH_BATCH])
+            for i in range(0, len(daily), FLUSH_BATCH):
+                await session.execute(daily_stmt, daily[i:i + FLUSH_BATCH])
+            await session.commit()
+    except BaseException:
+        # В том числе отмена: незакоммиченная транзакция откатится, данные дождутся следующего сброса
+        aggregator.restore(pending)
+        raise
+    return len(hourly)
+
+
+async def prune_usage():
+    """Удаляет часовые корзины старше RETENTION_DAYS"""
+    cutoff = datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+    async with async_session() as session:
+        await session.execute(delete(TrafficUsage).where(TrafficUsage.bucket < cutoff))
+        await session.commit()
+
+
+async def flush_loop(aggregator: UsageAggregator, wakeup: asyncio.Event):
+    """Сброс по таймеру или раньше, когда буфер достиг MAX_PENDING; при отмене — последний сброс"""
+    pruned_at = 0
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            try:
+                rows = await flush(aggregator)
+                if rows:
+                    logger.debug("Flushed %s usage rows (%s samples, %s rejected)",
+                                 rows, aggregator.samples, aggregator.rejected)
+                if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+                    await prune_usage()
+                    pruned_at = time.monotonic()
+            except Exception:
+                logger.exception("Usage flush failed, %s rows kept for retry", aggregator.pending)
+    except asyncio.CancelledError:
+        # Остановка бота: без этого сброса теряется до FLUSH_INTERVAL трафика
+        try:
+            rows = await asyncio.wait_for(flush(aggregator), SHUTDOWN_FLUSH_TIMEOUT)
+            logger.info("Flushed %s usage rows on shutdown", rows)
+        except (Exception, asyncio.CancelledError):
+            logger.exception("Final usage flush failed, %s rows lost", aggregator.pending)
+        raise
+
+
+def _feed(aggregator: UsageAggregator, wakeup: asyncio.Event, line):
+    aggregator.add_line(line)
+    if aggregator.pending >= MAX_PENDING:
+        wakeup.set()
+
+
+async def tail_file(path: str, aggregator: UsageAggregator, wakeup: asyncio.Event):
+    """Читает новые строки файла (как tail -F), переживает ротацию и усечение"""
+    while not os.path.exists(path):
+        await asyncio.sleep(TAIL_POLL_INTERVAL)
+    f = open(path, "rb")
+    f.seek(0, os.SEEK_END)
+    inode = os.fstat(f.fileno()).st_ino
+    buffer = b""
+    try:
+        while True:
+            chunk = f.read(1 << 16)
+            if chunk:
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line:
+                        _feed(aggregator, wakeup, line)
+                # Большой бэклог читается кусками, не занимая цикл событий целиком
+                await asyncio.sleep(0)
+                continue
+
+            await asyncio.sleep(TAIL_POLL_INTERVAL)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_ino != inode or stat.st_size < f.tell():
+                f.close()
+                f = open(path, "rb")
+                inode = os.fstat(f.fileno()).st_ino
+                buffer = b""
+    finally:
+        f.close()
+
+
+async def serve_socket(listen: str, aggregator: UsageAggregator, wakeup: asyncio.Event):
+    """TCP-приемник: ноды шлют те же JSON-строки, по одной на сэмпл.
+
+    Аутентификации нет, поэтому listen — loopback или внутренний адрес (127.0.0.1:9100,
+    10.0.0.5:9100), но не 0.0.0.0 на публичном интерфейсе. Слишком длинная строка
+    отбрасывается, соединение остается открытым.
+    """
+    host, port = listen.rsplit(":", 1)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    # readline уже выбросил из буфера строку сверх лимита
+                    aggregator.rejected += 1
+                    continue
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    _feed(aggregator, wakeup, line)
+        except ConnectionError as e:
+            logger.debug("Usage socket connection dropped: %s", e)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, int(port))
+    async with server:
+        await server.serve_forever()
+
+
+def start_ingest() -> list[asyncio.Task]:
+    """Запускает источники из TRAFFIC_FILE / TRAFFIC_LISTEN и цикл сброса.
+
+    Ссылки на задачи должен хранить вызывающий код (см. bot_run.track_task).
+    """
+    if not TRAFFIC_FILE and not TRAFFIC_LISTEN:
+        return []
+    aggregator = UsageAggregator()
+    wakeup = asyncio.Event()
+    tasks = [asyncio.create_task(flush_loop(aggregator, wakeup), name="usage_flush")]
+    if TRAFFIC_FILE:
+        tasks.append(asyncio.create_task(tail_file(TRAFFIC_FILE, aggregator, wakeup), name="usage_tail"))
+    if TRAFFIC_LISTEN:
+        tasks.append(asyncio.create_task(serve_socket(TRAFFIC_LISTEN, aggregator, wakeup), name="usage_socket"))
+    return tasks